@@ -0,0 +1,382 @@
+"""Benchmarks for the storage and review hot paths.
+
+Builds synthetic decks of the requested sizes (cached in ``--workdir`` so
+large decks are generated once), times each operation and writes the
+results as JSON. With ``--baseline`` the medians are compared against an
+earlier results file and the exit status is 1 when anything got slower by
+more than ``--tolerance``.
+
+    python bench.py --sizes 10k,100k --output results.json
+    python bench.py --sizes 10k,100k --baseline results.json
+    python bench.py --sizes 1m,5m --only import_questions,start_review --repeat 1
+
+The ``gui_*`` benchmarks drive the real window on Qt's offscreen platform
+and only run with ``--gui``.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import time
+
+import exporter
+import importer
+import scheduler
+from render import AnswerRenderer
+from reviewlog import ReviewLog
+from session import ReviewSession
+from store import CardStore
+
+# Bump when the generated decks change, so cached fixtures are rebuilt
+FIXTURE_VERSION = 1
+DEFAULT_SIZES = "10k,100k"
+SESSION_SIZE = 100  # as in fc.SESSION_SIZE
+GRADES = 1000
+RENDERED_ANSWERS = 500
+WRONG_PAGES = 20
+GUI_CARDS = 50
+# Differences below this many seconds are treated as noise
+NOISE_FLOOR = 0.002
+
+BENCHMARKS = {}
+GUI_BENCHMARKS = set()
+
+
+def benchmark(name, gui=False):
+    # Registers fn(workspace, size) -> (seconds, operations); setup stays outside the timed part
+    def register(fn):
+        BENCHMARKS[name] = fn
+        if gui:
+            GUI_BENCHMARKS.add(name)
+        return fn
+    return register
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+def question(i):
+    return f"What is term {i} of set {i % 97}?"
+
+
+def answer(i):
+    return f"**Term {i}** is defined as _item {i % 1009}_:\n\n- point {i % 7}\n- point {i % 11}\n\n`code({i})`"
+
+
+class Workspace:
+    """Synthetic fixtures for one benchmark run, cached between runs by size."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def _cached(self, name, build):
+        path = self.file(f"v{FIXTURE_VERSION}-{name}")
+        if not os.path.exists(path):
+            build(path + ".part")
+            os.replace(path + ".part", path)
+        return path
+
+    def legacy_deck(self, size):
+        # A deck in the original schema, which is also what "Import Database" reads
+        def build(path):
+            conn = sqlite3.connect(path)
+            conn.execute("CREATE TABLE flashcards (id INTEGER PRIMARY KEY, question TEXT NOT NULL, "
+                         "answer TEXT NOT NULL, correct INTEGER DEFAULT 0, wrong INTEGER DEFAULT 0)")
+            conn.executemany("INSERT INTO flashcards (question, answer) VALUES (?, ?)",
+                             ((question(i), answer(i)) for i in range(size)))
+            conn.commit()
+            conn.close()
+        return self._cached(f"legacy-{size}.db", build)
+
+    def dictionary(self, size):
+        def build(path):
+            with open(path, "w", encoding="utf-8") as file:
+                file.writelines(json.dumps({"question": question(i), "answer": answer(i)}) + "\n"
+                                for i in range(size))
+        return self._cached(f"dictionary-{size}.jsonl", build)
+
+    def deck(self, size):
+        # Current schema with schedules spread over two months around now and
+        # every tenth card marked wrong
+        def build(path):
+            store = CardStore(path)
+            importer.import_database(store, self.legacy_deck(size))
+            now = int(time.time())
+            with store.transaction() as conn:
+                conn.execute("UPDATE flashcards SET due = ? + ((id * 7919) % 60 - 30) * ?, "
+                             "wrong = (id % 10 = 0), lapses = id % 5", (now, scheduler.DAY))
+            store.close()
+        return self._cached(f"deck-{size}.db", build)
+
+    def copy(self, path):
+        target = self.file("work.db")
+        self.remove(target)
+        shutil.copyfile(path, target)
+        return target
+
+    def remove(self, path):
+        for name in (path, path + "-wal", path + "-shm"):
+            if os.path.exists(name):
+                os.remove(name)
+
+
+@benchmark("open_existing")
+def bench_open_existing(workspace, size):
+    deck = workspace.deck(size)
+    start = time.perf_counter()
+    CardStore(deck).close()
+    return time.perf_counter() - start, 1
+
+
+@benchmark("upgrade_legacy")
+def bench_upgrade_legacy(workspace, size):
+    path = workspace.copy(workspace.legacy_deck(size))
+    start = time.perf_counter()
+    CardStore(path).close()
+    return time.perf_counter() - start, size
+
+
+@benchmark("import_questions")
+def bench_import_questions(workspace, size):
+    source = workspace.legacy_deck(size)
+    path = workspace.file("work.db")
+    workspace.remove(path)
+    store = CardStore(path)
+    start = time.perf_counter()
+    importer.import_database(store, source)
+    elapsed = time.perf_counter() - start
+    store.close()
+    return elapsed, size
+
+
+@benchmark("import_dictionary")
+def bench_import_dictionary(workspace, size):
+    source = workspace.dictionary(size)
+    path = workspace.file("work.db")
+    workspace.remove(path)
+    store = CardStore(path)
+    start = time.perf_counter()
+    importer.import_dictionary_file(store, source)
+    elapsed = time.perf_counter() - start
+    store.close()
+    return elapsed, size
+
+
+@benchmark("export_csv")
+def bench_export_csv(workspace, size):
+    store = CardStore(workspace.deck(size))
+    target = workspace.file("export.csv")
+    start = time.perf_counter()
+    exporter.export_cards(store, target, stats=True)
+    elapsed = time.perf_counter() - start
+    store.close()
+    os.remove(target)
+    return elapsed, size
+
+
+@benchmark("start_review")
+def bench_start_review(workspace, size):
+    # What the Start button does: due ids, then the first card of the session
+    store = CardStore(workspace.deck(size))
+    start = time.perf_counter()
+    session = ReviewSession(store, store.due_card_ids(SESSION_SIZE))
+    session.current()
+    elapsed = time.perf_counter() - start
+    store.close()
+    return elapsed, 1
+
+
+@benchmark("update_card_status")
+def bench_update_card_status(workspace, size):
+    # Answers go through the write-behind log; the time includes flushing it
+    store = CardStore(workspace.copy(workspace.deck(size)))
+    card_ids = store.due_card_ids(GRADES)
+    review_log = ReviewLog(store)
+    start = time.perf_counter()
+    for n, card_id in enumerate(card_ids):
+        review_log.record(card_id, scheduler.GRADE_GOOD if n % 4 else scheduler.GRADE_AGAIN, 1500)
+    review_log.close()
+    elapsed = time.perf_counter() - start
+    store.close()
+    return elapsed, len(card_ids)
+
+
+@benchmark("view_answer")
+def bench_view_answer(workspace, size):
+    store = CardStore(workspace.deck(size))
+    cards = store.cards_by_ids(range(1, min(size, RENDERED_ANSWERS) + 1))
+    renderer = AnswerRenderer(store)
+    start = time.perf_counter()
+    for card in cards:
+        renderer.render(card)
+    elapsed = time.perf_counter() - start
+    renderer.close()
+    store.close()
+    return elapsed, len(cards)
+
+
+@benchmark("wrong_answers")
+def bench_wrong_answers(workspace, size):
+    # The wrong answers list: first page, then scrolling WRONG_PAGES pages on
+    store = CardStore(workspace.deck(size))
+    start = time.perf_counter()
+    after, pages = None, 0
+    for pages in range(1, WRONG_PAGES + 1):
+        rows = store.wrong_page("due", after=after)
+        if not rows:
+            break
+        after = (rows[-1][4], rows[-1][0])
+    elapsed = time.perf_counter() - start
+    store.close()
+    return elapsed, pages
+
+
+def qt_app():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
+
+
+def wait_for(app, condition, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("window did not finish in time")
+        app.processEvents()
+        time.sleep(0.001)
+
+
+@benchmark("gui_open_window", gui=True)
+def bench_gui_open_window(workspace, size):
+    app = qt_app()
+    import fc
+
+    deck = workspace.deck(size)
+    start = time.perf_counter()
+    window = fc.FlashcardApp(deck)
+    window.show()
+    app.processEvents()
+    elapsed = time.perf_counter() - start
+    window.close()
+    return elapsed, 1
+
+
+@benchmark("gui_review", gui=True)
+def bench_gui_review(workspace, size):
+    # Start a review and answer GUI_CARDS cards through the window's own slots
+    app = qt_app()
+    import fc
+
+    window = fc.FlashcardApp(workspace.copy(workspace.deck(size)))
+    window.show()
+    start = time.perf_counter()
+    window.start_review()
+    wait_for(app, lambda: window.session and not window.tasks.tasks)
+    answered = 0
+    while answered < GUI_CARDS and window.session.current() is not None:
+        window.view_answer()
+        window.mark_correct()
+        app.processEvents()
+        answered += 1
+    window.review_log.flush()
+    elapsed = time.perf_counter() - start
+    window.close()
+    return elapsed, answered
+
+
+def run(names, sizes, workspace, repeat=3, report=print):
+    results = {}
+    for size in sizes:
+        for name in names:
+            times = []
+            for _ in range(repeat):
+                seconds, operations = BENCHMARKS[name](workspace, size)
+                times.append(seconds)
+            median = statistics.median(times)
+            results[f"{name}@{size}"] = {
+                "benchmark": name, "size": size, "operations": operations, "runs": times,
+                "min": min(times), "median": median, "ops_per_s": operations / median if median else None,
+            }
+            report(f"{name:<20} {size:>9}  {median * 1000:>10.1f} ms  "
+                   f"{operations / median if median else 0:>12.0f} ops/s")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # (key, baseline median, new median) for every benchmark that got slower than allowed
+    regressions = []
+    for key, result in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        if result["median"] > old["median"] * (1 + tolerance) and result["median"] - old["median"] > NOISE_FLOOR:
+            regressions.append((key, old["median"], result["median"]))
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Time the flashcards storage and review hot paths")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help="comma-separated deck sizes, k/m suffixes allowed (default: %(default)s)")
+    parser.add_argument("--only", help="comma-separated benchmark names (default: all)")
+    parser.add_argument("--gui", action="store_true", help="also run the offscreen window benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the median is compared")
+    parser.add_argument("--workdir", default=".bench", help="where generated decks are kept (default: %(default)s)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown against the baseline (default: %(default)s)")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks and exit")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+    if args.only:
+        names = args.only.split(",")
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            sys.exit(f"Unknown benchmarks: {', '.join(unknown)}")
+    else:
+        names = [name for name in BENCHMARKS if args.gui or name not in GUI_BENCHMARKS]
+
+    workspace = Workspace(args.workdir)
+    results = run(names, [parse_size(size) for size in args.sizes.split(",")], workspace, args.repeat)
+    workspace.remove(workspace.file("work.db"))
+    document = {
+        "meta": {"created": int(time.time()), "python": platform.python_version(),
+                 "sqlite": sqlite3.sqlite_version, "platform": platform.platform(), "repeat": args.repeat},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(document, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file)["results"], args.tolerance)
+        for key, old, new in regressions:
+            print(f"REGRESSION {key}: {old * 1000:.1f} ms -> {new * 1000:.1f} ms ({new / old - 1:+.0%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Compressed, content-addressed storage for long answers and embedded images.
+
+Blobs are keyed by the SHA-256 of their content, so an image used by a
+thousand answers is stored once. Answers longer than ``ANSWER_BLOB_CHARS``
+move into a compressed blob and leave a short preview in
+``flashcards.answer``, which keeps card rows (and every scan over them)
+small. Images given as data URIs (or, for cards typed into the window,
+local files) are stored as blobs and referenced from the answer as
+``blob:<sha256>``; the window materializes them as files, exports and sync
+turn them back into data URIs.
+"""
+import base64
+import hashlib
+import mimetypes
+import os
+import re
+import zlib
+from urllib.parse import unquote, urlparse
+
+try:
+    import zstandard
+except ImportError:  # zlib is always there; zstd only compresses faster
+    zstandard = None
+
+ANSWER_BLOB_CHARS = 2048
+PREVIEW_CHARS = 200
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+TEXT_MIME = "text/markdown"
+
+# Image targets in markdown (![alt](target)) and HTML (<img src="target">)
+IMAGE_PATTERN = re.compile(r"""(!\[[^\]]*\]\(\s*<?|<img\s[^>]*?src\s*=\s*["']?)([^\s)"'<>]+)""", re.IGNORECASE)
+DATA_URI = re.compile(r"data:([\w.+-]+/[\w.+-]+);base64,(.+)", re.DOTALL)
+BLOB_REF = re.compile(r"blob:([0-9a-f]{64})")
+
+SQL_BLOB_ID = "SELECT id FROM blobs WHERE hash = ?"
+SQL_INSERT_BLOB = "INSERT INTO blobs (hash, mime, size, codec, data) VALUES (?, ?, ?, ?, ?)"
+SQL_BLOB = "SELECT mime, codec, data FROM blobs WHERE id = ?"
+SQL_BLOB_BY_HASH = "SELECT mime, codec, data FROM blobs WHERE hash = ?"
+# The full answer of a card, for SQL that needs the text rather than the preview
+SQL_ANSWER_TEXT = "coalesce((SELECT blob_text(codec, data) FROM blobs WHERE id = {0}.answer_blob), {0}.answer)"
+
+
+def pack(data):
+    # (codec, bytes to store); already compressed media such as PNG or JPEG is kept raw
+    if zstandard is not None:
+        codec, packed = "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    else:
+        codec, packed = "zlib", zlib.compress(data, ZLIB_LEVEL)
+    return (codec, packed) if len(packed) < len(data) else ("raw", data)
+
+
+def unpack(codec, data):
+    if codec == "raw":
+        return bytes(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This database has zstd-compressed answers; install the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown blob codec: {codec}")
+
+
+def blob_text(codec, data):
+    # Registered as an SQL function so triggers and queries can read text blobs
+    return None if data is None else unpack(codec, data).decode("utf-8")
+
+
+def put(conn, data, mime):
+    # Returns (blob id, hex digest); identical content is stored only once
+    digest = hashlib.sha256(data).digest()
+    row = conn.execute(SQL_BLOB_ID, (digest,)).fetchone()
+    if row is not None:
+        return row[0], digest.hex()
+    codec, packed = pack(data)
+    return conn.execute(SQL_INSERT_BLOB, (digest, mime, len(data), codec, packed)).lastrowid, digest.hex()
+
+
+def read(conn, blob_id):
+    # (mime, content) or None
+    row = conn.execute(SQL_BLOB, (blob_id,)).fetchone()
+    return None if row is None else (row[0], unpack(row[1], row[2]))
+
+
+def read_hash(conn, digest_hex):
+    row = conn.execute(SQL_BLOB_BY_HASH, (bytes.fromhex(digest_hex),)).fetchone()
+    return None if row is None else (row[0], unpack(row[1], row[2]))
+
+
+def _local_file(target):
+    # Absolute paths and file: URLs of existing files; relative paths are left alone
+    if target.lower().startswith("file:"):
+        target = unquote(urlparse(target).path)
+    elif not os.path.isabs(target):
+        return None
+    return target if os.path.isfile(target) else None
+
+
+def image_targets(text):
+    return {match.group(2) for match in IMAGE_PATTERN.finditer(text)}
+
+
+def store_media(conn, text, allow_files=False, keep=()):
+    """Replace data-URI images in ``text`` with blob references.
+
+    Local files are only read with ``allow_files``, for text the user typed
+    in; synced and imported text could otherwise pull any readable file
+    into the database, and from there to every other copy. Targets in
+    ``keep`` (those of the text being edited) are never read.
+    """
+    def replace(match):
+        prefix, target = match.groups()
+        data_uri = DATA_URI.match(target)
+        if data_uri is not None:
+            mime = data_uri.group(1)
+            try:
+                data = base64.b64decode(data_uri.group(2), validate=True)
+            except ValueError:
+                return match.group(0)
+        else:
+            path = _local_file(target) if allow_files and target not in keep else None
+            if path is None:
+                return match.group(0)
+            with open(path, "rb") as file:
+                data = file.read()
+            mime = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return prefix + "blob:" + put(conn, data, mime)[1]
+    return IMAGE_PATTERN.sub(replace, text)
+
+
+def pack_answer(conn, answer, allow_files=False, keep=()):
+    # (value for flashcards.answer, answer_blob id or None)
+    answer = store_media(conn, answer, allow_files, keep)
+    if len(answer) <= ANSWER_BLOB_CHARS:
+        return answer, None
+    blob_id, _ = put(conn, answer.encode("utf-8"), TEXT_MIME)
+    return answer[:PREVIEW_CHARS].rstrip() + "…", blob_id
+
+
+def to_data_uris(conn, text):
+    # Self-contained text for exports and sync; unknown references are kept
+    if "blob:" not in text:
+        return text
+
+    def replace(match):
+        blob = read_hash(conn, match.group(1))
+        if blob is None:
+            return match.group(0)
+        mime, data = blob
+        return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+    return BLOB_REF.sub(replace, text)
+
+
+def media_refs(text):
+    return BLOB_REF.findall(text)
@@ -0,0 +1,302 @@
+"""Command line interface for batch jobs on a flashcards database.
+
+Nothing here imports PySide6 or markdown, so it starts quickly and runs on
+headless machines; only the ``gui`` command (and ``review`` without
+``--tty``) loads the Qt front end.
+"""
+import argparse
+import sys
+import time
+
+from profiling import PROFILER
+from store import DEFAULT_DB, CardStore
+
+
+def print_progress(done, total):
+    print(f"\r{done}/{total} cards", end="", file=sys.stderr, flush=True)
+
+
+def card_filters(store, args):
+    # --deck/--tag names to the ids the store filters on; unknown names are an error
+    filters = {"deck_id": None, "tag_id": None}
+    if args.deck is not None:
+        filters["deck_id"] = store.deck_id(args.deck)
+        if filters["deck_id"] is None:
+            sys.exit(f"No deck named {args.deck!r}.")
+    if args.tag is not None:
+        filters["tag_id"] = store.tag_id(args.tag)
+        if filters["tag_id"] is None:
+            sys.exit(f"No tag named {args.tag!r}.")
+    return filters
+
+
+def add_filter_arguments(parser):
+    parser.add_argument("--deck", help="only cards in this deck")
+    parser.add_argument("--tag", help="only cards with this tag")
+
+
+def cmd_import(store, args):
+    import importer
+
+    progress = None if args.quiet else print_progress
+    deck_id = store.deck_id(args.deck, create=True)
+    if args.source.lower().endswith((".json", ".jsonl")):
+        result = importer.import_dictionary_file(store, args.source, deck_id, chunk_size=args.chunk_size,
+                                                 progress=progress)
+        if not args.quiet:
+            print(file=sys.stderr)
+        print(f"Imported {result.inserted} questions ({result.duplicates} duplicates, "
+              f"{result.error_count} invalid rows).")
+        for row, error in result.errors:
+            print(f"row {row}: {error}", file=sys.stderr)
+        return 1 if result.error_count else 0
+
+    read, inserted = importer.import_database(store, args.source, deck_id, chunk_size=args.chunk_size,
+                                              progress=progress)
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"Imported {inserted} unique questions ({read} read).")
+
+
+def cmd_export(store, args):
+    import exporter
+
+    written = exporter.export_cards(store, args.target, fmt=args.format, compressed=args.gzip or None,
+                                    stats=args.stats, header=args.header, wrong_only=args.wrong_only,
+                                    due_only=args.due_only, progress=None if args.quiet else print_progress,
+                                    **card_filters(store, args))
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"Exported {written} cards to {args.target}.")
+
+
+def cmd_dedupe(store, args):
+    import dedupe
+
+    groups = dedupe.find_duplicates(store, near=args.near, threshold=args.threshold,
+                                    progress=None if args.quiet else print_progress)
+    if not args.quiet and args.near:
+        print(file=sys.stderr)
+    for group in groups:
+        print(" ".join(str(card_id) for card_id in group))
+    if args.dry_run:
+        print(f"{len(groups)} duplicate groups, {sum(len(group) - 1 for group in groups)} cards to merge.")
+        return
+    removed = dedupe.merge_duplicates(store, groups)
+    print(f"Merged {len(groups)} duplicate groups, removed {removed} cards.")
+
+
+def cmd_stats(store, args):
+    import stats
+
+    report = stats.deck_report(store)
+    summary = report["summary"]
+    retention = summary["retention_30d"]
+    print(f"Cards:            {summary['cards']}")
+    print(f"  due now:        {summary['due']}")
+    print(f"  new:            {summary['new']}")
+    print(f"  marked wrong:   {summary['wrong']}")
+    print(f"Reviews today:    {summary['reviews_today']}")
+    print(f"Reviews (30d):    {summary['reviews_30d']}")
+    print(f"Retention (30d):  {'-' if retention is None else f'{retention:.0%}'}")
+    print("Due next 14 days: " + " ".join(str(count) for count in report["forecast"]))
+    print("Retention by days since last review:")
+    for bound, answers, rate in report["retention"]:
+        if answers:
+            print(f"  {bound:>4}+ days  {rate:>4.0%}  ({answers} answers)")
+    if report["hardest"]:
+        print("Hardest cards:")
+        for card_id, question, reviews, difficulty in report["hardest"]:
+            print(f"  {card_id:>8}  {difficulty:>4.0%} of {reviews:<4} {question.splitlines()[0][:60]}")
+
+
+def cmd_decks(store, args):
+    for _, name, count in store.decks():
+        print(f"{count:>8}  {name}")
+    tags = store.tags()
+    if tags:
+        print("Tags:")
+        for _, name, count in tags:
+            print(f"{count:>8}  {name}")
+
+
+def cmd_vacuum(store, args):
+    import os
+
+    before = os.path.getsize(store.path)
+    store.vacuum()
+    print(f"Database compacted: {before // 1024} KiB -> {os.path.getsize(store.path) // 1024} KiB.")
+
+
+def cmd_maintain(store, args):
+    import maintenance
+
+    done = maintenance.run(store, force=True)
+    print(f"Done: {', '.join(done) or 'nothing to do'}.")
+
+
+def cmd_sync(store, args):
+    import sync
+
+    try:
+        result = sync.sync(store, args.url, progress=None if args.quiet else print_progress)
+    except sync.SyncError as e:
+        sys.exit(str(e))
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"Synced with {args.url}: {result}.")
+
+
+def cmd_sync_server(store, args):
+    import sync
+
+    server = sync.SyncServer(store, args.host, args.port)
+    print(f"Serving {args.db} for sync on http://{args.host}:{server.server_address[1]} (Ctrl+C to stop).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print()
+    finally:
+        server.server_close()
+
+
+def cmd_review(store, args):
+    import scheduler
+    from reviewlog import ReviewLog
+    from session import ReviewSession
+
+    filters = card_filters(store, args)
+    if args.wrong:
+        session = ReviewSession(store, store.wrong_card_ids(**filters), shuffle=True)
+    else:
+        session = ReviewSession(store, store.due_card_ids(args.limit, **filters))
+    if not session:
+        print("No cards to review.")
+        return
+
+    review_log = ReviewLog(store)
+    reviewed = correct = 0
+    try:
+        while (card := session.current()) is not None:
+            print(f"\n[{session.index + 1}/{len(session)}] {card[1]}")
+            shown_at = time.monotonic()
+            if input("Press Enter to show the answer (q to quit) ").strip().lower() == "q":
+                break
+            print(f"\n{store.answer_text(card)}\n")
+            answer = ""
+            while answer not in ("y", "n", "q"):
+                answer = input("Correct? [y]es / [n]o, redo / [q]uit: ").strip().lower()
+            if answer == "q":
+                break
+            response_ms = int((time.monotonic() - shown_at) * 1000)
+            review_log.record(card[0], scheduler.GRADE_GOOD if answer == "y" else scheduler.GRADE_AGAIN, response_ms)
+            reviewed += 1
+            correct += answer == "y"
+            session.advance()
+    except (EOFError, KeyboardInterrupt):
+        print()
+    finally:
+        review_log.close()
+    print(f"Reviewed {reviewed} cards, {correct} correct.")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="flashcards", description="Open Flashcards batch operations")
+    parser.add_argument("--db", default=DEFAULT_DB, help="flashcards database (default: %(default)s)")
+    parser.add_argument("--trace", metavar="FILE", help="profile the run and write a Chrome trace to FILE")
+    parser.add_argument("--profile", metavar="FILE", help="profile the run and write a JSON timing summary to FILE")
+    parser.add_argument("--slow-query-ms", type=float, default=50,
+                        help="log statements slower than this while profiling (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="merge another flashcards database or a JSON dictionary")
+    import_parser.add_argument("source", help="SQLite deck (.db), JSON array (.json) or JSON Lines (.jsonl) file")
+    import_parser.add_argument("--deck", default="Default", help="deck to import into, created if needed "
+                                                                 "(default: %(default)s)")
+    import_parser.add_argument("--chunk-size", type=int, default=5000)
+    import_parser.add_argument("-q", "--quiet", action="store_true", help="no progress output")
+    import_parser.set_defaults(func=cmd_import)
+
+    export_parser = commands.add_parser("export", help="write cards to CSV or JSON Lines")
+    export_parser.add_argument("target", help="output file; .jsonl and .gz extensions pick the format")
+    export_parser.add_argument("--format", choices=("csv", "jsonl"), help="override the format from the extension")
+    export_parser.add_argument("--gzip", action="store_true", help="gzip-compress the output")
+    export_parser.add_argument("--stats", action="store_true", help="include review statistics columns")
+    export_parser.add_argument("--header", action="store_true", help="write a CSV header row")
+    export_parser.add_argument("--wrong-only", action="store_true", help="only cards marked wrong")
+    export_parser.add_argument("--due-only", action="store_true", help="only cards due now")
+    add_filter_arguments(export_parser)
+    export_parser.add_argument("-q", "--quiet", action="store_true", help="no progress output")
+    export_parser.set_defaults(func=cmd_export)
+
+    dedupe_parser = commands.add_parser("dedupe", help="find and merge duplicate cards")
+    dedupe_parser.add_argument("--near", action="store_true",
+                               help="also merge similar questions with the same answer; by default only questions "
+                                    "identical after whitespace/case normalization")
+    dedupe_parser.add_argument("--threshold", type=float, default=0.8,
+                               help="estimated question similarity for --near (default: %(default)s)")
+    dedupe_parser.add_argument("--dry-run", action="store_true", help="list duplicate groups without merging")
+    dedupe_parser.add_argument("-q", "--quiet", action="store_true", help="no progress output")
+    dedupe_parser.set_defaults(func=cmd_dedupe)
+
+    commands.add_parser("stats", help="show deck and review statistics").set_defaults(func=cmd_stats)
+    commands.add_parser("decks", help="list decks and tags with their card counts").set_defaults(func=cmd_decks)
+    commands.add_parser("vacuum", help="checkpoint, compact and re-analyze the database").set_defaults(func=cmd_vacuum)
+    commands.add_parser("maintain", help="run the background upkeep steps now (optimize, free pages, "
+                                         "checkpoint)").set_defaults(func=cmd_maintain)
+
+    sync_parser = commands.add_parser("sync", help="exchange changes with a sync server")
+    sync_parser.add_argument("url", help="sync server address, e.g. http://192.168.1.10:8765")
+    sync_parser.add_argument("-q", "--quiet", action="store_true", help="no progress output")
+    sync_parser.set_defaults(func=cmd_sync)
+
+    server_parser = commands.add_parser("sync-server", help="serve this database to other devices for sync")
+    server_parser.add_argument("--host", default="127.0.0.1",
+                               help="address to listen on; 0.0.0.0 for the whole network (default: %(default)s)")
+    server_parser.add_argument("--port", type=int, default=8765, help="(default: %(default)s)")
+    server_parser.set_defaults(func=cmd_sync_server)
+
+    review_parser = commands.add_parser("review", help="review due cards")
+    review_parser.add_argument("--tty", action="store_true", help="review in the terminal instead of the window")
+    review_parser.add_argument("--wrong", action="store_true", help="review cards marked wrong (terminal only)")
+    review_parser.add_argument("--limit", type=int, default=100, help="maximum due cards per session")
+    add_filter_arguments(review_parser)
+    review_parser.set_defaults(func=cmd_review)
+
+    commands.add_parser("gui", help="open the flashcards window").set_defaults(func=None)
+
+    return parser
+
+
+def run(args):
+    if args.command == "gui" or (args.command == "review" and not args.tty):
+        import fc
+
+        if args.command == "review":
+            return fc.main(args.db, start_review=True, deck=args.deck, tag=args.tag)
+        return fc.main(args.db)
+
+    store = CardStore(args.db)
+    try:
+        with PROFILER.span(args.command, "cli"):
+            return args.func(store, args) or 0
+    finally:
+        store.close()
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not (args.trace or args.profile):
+        return run(args)
+    PROFILER.enable(args.slow_query_ms)
+    try:
+        return run(args)
+    finally:
+        if args.trace:
+            PROFILER.write_chrome_trace(args.trace)
+        if args.profile:
+            PROFILER.write_summary(args.profile)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import hashlib
+from array import array
+
+from blobs import SQL_ANSWER_TEXT
+from store import normalize_question, question_hash
+
+CHUNK_SIZE = 5000
+SHINGLE_WORDS = 3
+# 32 MinHash values split into 8 bands of 4: questions sharing any band become
+# candidates (likely from ~60% similarity), which are then checked against
+# SIMILARITY on the full signature.
+NUM_HASHES = 32
+BANDS = 8
+SIMILARITY = 0.8
+
+
+class UnionFind:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        root = self.parent.setdefault(item, item)
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while item != root:
+            item, self.parent[item] = self.parent[item], root
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+    def groups(self):
+        groups = {}
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+def shingles(question):
+    words = normalize_question(question).split()
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def signature(question):
+    # One SHAKE-128 digest per shingle supplies all NUM_HASHES 32-bit hash
+    # values at once; the signature is their element-wise minimum.
+    hashes = []
+    for shingle in shingles(question):
+        values = array('I')
+        values.frombytes(hashlib.shake_128(shingle.encode("utf-8")).digest(NUM_HASHES * 4))
+        hashes.append(values)
+    return array('I', map(min, zip(*hashes)))
+
+
+def similarity(signature_a, signature_b):
+    return sum(a == b for a, b in zip(signature_a, signature_b)) / len(signature_a)
+
+
+def find_near_duplicates(store, threshold=SIMILARITY, chunk_size=CHUNK_SIZE, progress=None):
+    """Group cards whose questions are near-duplicates, in one pass over the deck.
+
+    Questions are reduced to MinHash signatures of their word shingles and
+    bucketed by LSH band (and deck) in a scratch database, so only cards of
+    the same deck sharing a bucket are ever compared. Each group has a
+    representative, its lowest card id, and every other card in it has a
+    question similar to the representative's and the same normalized
+    answer; similarity is not chained from card to card. Returns sorted
+    lists of card ids.
+    """
+    rows_per_band = NUM_HASHES // BANDS
+    representative = {}
+    total = store.count_cards()
+    conn = store.connection
+
+    # A private on-disk scratch database keeps the band table out of Python memory
+    conn.execute("ATTACH DATABASE '' AS dedupe_scratch")
+    try:
+        conn.execute("CREATE TABLE dedupe_scratch.signatures (card_id INTEGER PRIMARY KEY, signature BLOB, "
+                     "answer_hash INTEGER)")
+        conn.execute("CREATE TABLE dedupe_scratch.bands (band INTEGER, bucket INTEGER, card_id INTEGER)")
+        cursor = store.execute(f"SELECT id, deck_id, question, {SQL_ANSWER_TEXT.format('flashcards')} "
+                               "FROM flashcards")
+        done = 0
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            signatures, bands = [], []
+            for card_id, deck_id, question, answer in rows:
+                sig = signature(question)
+                signatures.append((card_id, sig.tobytes(), question_hash(answer)))
+                for band in range(BANDS):
+                    bucket = hash((deck_id, *sig[band * rows_per_band:(band + 1) * rows_per_band]))
+                    bands.append((band, bucket, card_id))
+            with store.transaction():
+                conn.executemany("INSERT INTO dedupe_scratch.signatures VALUES (?, ?, ?)", signatures)
+                conn.executemany("INSERT INTO dedupe_scratch.bands VALUES (?, ?, ?)", bands)
+            done += len(rows)
+            if progress is not None:
+                progress(done, total)
+
+        def card(card_id):
+            sig, answer_hash = conn.execute("SELECT signature, answer_hash FROM dedupe_scratch.signatures "
+                                            "WHERE card_id = ?", (card_id,)).fetchone()
+            return array('I', sig), answer_hash
+
+        # Within a bucket, ungrouped cards are compared with the representative
+        # of the bucket's first card (that card itself unless already grouped)
+        buckets = conn.execute("SELECT group_concat(card_id) FROM dedupe_scratch.bands "
+                               "GROUP BY band, bucket HAVING COUNT(*) > 1")
+        for ids, in buckets.fetchall():
+            ids = sorted(int(card_id) for card_id in ids.split(","))
+            rep_id = representative.get(ids[0], ids[0])
+            rep = None
+            for card_id in ids[1:]:
+                if card_id in representative:
+                    continue
+                rep = rep or card(rep_id)
+                other = card(card_id)
+                if other[1] == rep[1] and similarity(rep[0], other[0]) >= threshold:
+                    representative[rep_id] = rep_id
+                    representative[card_id] = rep_id
+    finally:
+        conn.execute("DETACH DATABASE dedupe_scratch")
+    groups = {}
+    for card_id, rep_id in representative.items():
+        groups.setdefault(rep_id, []).append(card_id)
+    return [sorted(group) for group in groups.values()]
+
+
+def find_duplicates(store, near=False, threshold=SIMILARITY, progress=None):
+    # Exact (normalized) duplicates come straight from the question_hash index;
+    # near duplicates only when asked for
+    clusters = UnionFind()
+    for group in store.duplicate_groups():
+        for card_id in group[1:]:
+            clusters.union(group[0], card_id)
+    if near:
+        for group in find_near_duplicates(store, threshold, progress=progress):
+            for card_id in group[1:]:
+                clusters.union(group[0], card_id)
+    return clusters.groups()
+
+
+def merge_duplicates(store, groups, progress=None):
+    # Keeps the oldest card of each group; returns the number of cards removed
+    removed = 0
+    for done, group in enumerate(groups, 1):
+        store.merge_cards(group[0], group[1:])
+        removed += len(group) - 1
+        if progress is not None:
+            progress(done, len(groups))
+    return removed
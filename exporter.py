@@ -0,0 +1,72 @@
+import csv
+import gzip
+import json
+import os
+
+from store import EXPORT_COLUMNS, STATS_COLUMNS
+
+CHUNK_SIZE = 5000
+FORMATS = ("csv", "jsonl")
+
+
+def format_for(file_name):
+    # "cards.jsonl.gz" -> ("jsonl", True)
+    name = file_name.lower()
+    compressed = name.endswith(".gz")
+    if compressed:
+        name = name[:-3]
+    return ("jsonl" if name.endswith((".jsonl", ".json")) else "csv"), compressed
+
+
+def export_cards(store, file_name, fmt=None, compressed=None, stats=False, header=False,
+                 wrong_only=False, due_only=False, deck_id=None, tag_id=None, chunk_size=CHUNK_SIZE, progress=None):
+    """Stream cards to ``file_name`` as CSV or JSON Lines, optionally gzip-compressed.
+
+    Format and compression default to what the file extension says. Rows
+    are read ``chunk_size`` at a time, so memory use does not depend on the
+    deck size. Output goes to a temporary file that only replaces
+    ``file_name`` once every row is written, so a failed or cancelled export
+    leaves no partial file behind. Returns the number of cards written.
+    """
+    guessed_format, guessed_compressed = format_for(file_name)
+    fmt = fmt or guessed_format
+    compressed = guessed_compressed if compressed is None else compressed
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    columns = EXPORT_COLUMNS + (STATS_COLUMNS if stats else ())
+    filters = {"wrong_only": wrong_only, "due_only": due_only, "deck_id": deck_id, "tag_id": tag_id}
+    total = store.count_cards(**filters)
+    cursor = store.export_rows(columns, **filters)
+
+    temp_name = file_name + ".part"
+    opener = gzip.open if compressed else open
+    written = 0
+    try:
+        with opener(temp_name, 'wt', newline='', encoding='utf-8') as file:
+            if fmt == "csv":
+                writer = csv.writer(file)
+                if header:
+                    writer.writerow(columns)
+                write_rows = writer.writerows
+            else:
+                def write_rows(rows):
+                    file.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows)
+            answer = columns.index("answer")
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                # Embedded images are written out as data URIs so the file stands alone
+                write_rows([row[:answer] + (store.portable_text(row[answer]),) + row[answer + 1:]
+                            if "blob:" in row[answer] else row for row in rows])
+                written += len(rows)
+                if progress is not None:
+                    progress(written, total)
+        os.replace(temp_name, file_name)
+    except BaseException:
+        cursor.close()
+        if os.path.exists(temp_name):
+            os.remove(temp_name)
+        raise
+    return written
@@ -1,548 +1,964 @@
-import csv
-import json
-import sys
-import random
-
-import markdown
-from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                               QPushButton, QLineEdit, QLabel, QListWidget, QStackedWidget,
-                               QDialog, QDialogButtonBox, QFileDialog, QMessageBox, QTextEdit, QFormLayout, QGroupBox,
-                               QInputDialog)
-from PySide6.QtCore import Qt, QPropertyAnimation, QEasingCurve, QSize
-from PySide6.QtGui import QColor, QIcon, QFont
-import sqlite3
-
-
-class FlashcardApp(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("Open Flashcards")
-        self.setMinimumWidth(600)
-        self.setStyleSheet("""
-            QMainWindow, QWidget {
-                background-color: #0d101d;
-                color: #FFFFFF;
-            }
-            QPushButton {
-                background-color: #343444;
-                color: #bfb6b0;
-                border: none;
-                font-size: 13px;
-                font-weight: bold;
-                padding: 5px;
-                height: 50px;
-                border-radius: 3px;
-            }
-            QPushButton:hover {
-                background-color: #484857;
-            }
-            QLineEdit {
-                background-color: #3D3D3D;
-                color: #FFFFFF;
-                border: 1px solid #5A5A5A;
-                padding: 3px;
-            }
-            QListWidget {
-                background-color: #333742;
-                color: #e5e6e9;
-                border: 1px solid #5A5A5A;
-            }
-            QGroupBox {
-                border: 1px solid #454951;
-                border-radius: 5px;
-                margin-top: 10px;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                subcontrol-position: top left;
-                color: #bfb6b0;
-                padding: 5px;
-            }
-        """)
-
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
-        self.layout = QVBoxLayout(self.central_widget)
-
-        self.stacked_widget = QStackedWidget()
-        self.layout.addWidget(self.stacked_widget)
-
-        self.setup_main_page()
-        self.setup_add_card_page()
-        self.setup_review_page()
-        self.setup_wrong_answers_page()
-
-        self.db_connection = sqlite3.connect("flashcards.db")
-        self.create_table()
-
-    def setup_main_page(self):
-        main_page = QWidget()
-        main_layout = QVBoxLayout(main_page)
-
-        # Create a group box for each section
-        add_card_group = QGroupBox()
-        review_group = QGroupBox()
-        wrong_answers_group = QGroupBox()
-        import_group = QGroupBox()
-        main_heading = QLabel("Open Flashcards")
-        main_heading.setStyleSheet("font-size: 22px; font-weight: bold; color: #bfb6b0;")
-        main_heading.setAlignment(Qt.AlignCenter)
-
-        # Create a form layout for each group box
-        add_card_layout = QFormLayout(add_card_group)
-        review_layout = QFormLayout(review_group)
-        wrong_answers_layout = QFormLayout(wrong_answers_group)
-        import_layout = QFormLayout(import_group)
-        import_layout.setAlignment(Qt.AlignmentFlag.AlignBottom)
-
-        # Create buttons and add them to the form layouts
-        add_button = QPushButton("Add New Cards")
-        icon = QIcon('add_dict.png')
-        icon.addFile('add_dict.png', QSize(45, 45))
-        add_button.setIcon(icon)
-        add_button.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(1))
-        add_card_layout.addRow(add_button)
-
-        review_button = QPushButton("Start Flashcards")
-        review_button.clicked.connect(self.start_review)
-        review_layout.addRow(review_button)
-
-        review_wrong_button = QPushButton("Open redo cards")
-        review_wrong_button.clicked.connect(self.start_review_wrong)
-        review_layout.addRow(review_wrong_button)
-
-        wrong_answers_button = QPushButton("View")
-        wrong_answers_button.clicked.connect(self.show_wrong_answers)
-        wrong_answers_layout.addRow(wrong_answers_button)
-
-        import_button = QPushButton("Import Database")
-        import_button.clicked.connect(self.import_questions)
-        import_layout.addRow(import_button)
-
-        import_dict_button = QPushButton("Import Dictionary")
-        import_dict_button.clicked.connect(self.import_dictionary)
-        import_layout.addRow(import_dict_button)
-
-        export_csv_button = QPushButton("Export to CSV")
-        export_csv_button.clicked.connect(self.export_to_csv)
-        import_layout.addRow(export_csv_button)
-
-        # Add the group boxes to the main layout
-        main_layout.addWidget(main_heading)
-        main_layout.addWidget(add_card_group)
-        main_layout.addWidget(review_group)
-        main_layout.addWidget(wrong_answers_group)
-        main_layout.addWidget(import_group)
-
-        self.stacked_widget.addWidget(main_page)
-
-    def import_dictionary(self):
-        # Get the dictionary string from the user
-        dict_string, ok = QInputDialog.getText(self, "Import Dictionary", "Enter the dictionary string:",)
-
-
-        # If the user clicked OK and the string is not empty
-        if ok and dict_string:
-            try:
-                # Convert the string to a dictionary
-                data = json.loads(dict_string)
-
-                # Check if the data is a list of dictionaries with "question" and "answer" keys
-                if isinstance(data, list) and all(
-                        isinstance(item, dict) and "question" in item and "answer" in item for item in data):
-                    # Insert the data into the database
-                    cursor = self.db_connection.cursor()
-                    cursor.executemany("INSERT INTO flashcards (question, answer) VALUES (:question, :answer)", data)
-                    self.db_connection.commit()
-
-                    QMessageBox.information(self, "Import Successful", f"Imported {len(data)} questions.")
-                else:
-                    QMessageBox.warning(self, "Import Failed",
-                                        "Invalid dictionary format. The data should be a list of dictionaries with 'question' and 'answer' keys.")
-            except json.JSONDecodeError:
-                QMessageBox.warning(self, "Import Failed",
-                                    "Invalid dictionary string. Please enter a valid JSON string.")
-
-    def setup_add_card_page(self):
-        add_card_page = QWidget()
-        add_card_layout = QVBoxLayout(add_card_page)
-
-        self.question_input = QTextEdit()
-        self.question_input.setPlaceholderText("Enter question")
-        add_card_layout.addWidget(self.question_input)
-
-        self.answer_input = QTextEdit()
-        self.answer_input.setPlaceholderText("Enter answer")
-        add_card_layout.addWidget(self.answer_input)
-
-        save_button = QPushButton("Save Card")
-        save_button.clicked.connect(self.save_card)
-        add_card_layout.addWidget(save_button)
-
-        back_button = QPushButton("Back to Main")
-        back_button.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(0))
-        add_card_layout.addWidget(back_button)
-
-        self.stacked_widget.addWidget(add_card_page)
-
-    def setup_review_page(self):
-        self.review_page = QWidget()
-        review_layout = QVBoxLayout(self.review_page)
-
-        self.card_label = QLabel("Question will appear here")
-        self.card_label.setWordWrap(True)
-        self.card_label.setAlignment(Qt.AlignCenter)
-        self.card_label.setStyleSheet("""
-            background-color: #171b26; 
-            border-radius: 15px; 
-            padding: 50px;
-            color: #e5e6e9;
-            font-size: 22px;
-            font-weight: medium;
-        """)
-        review_layout.addWidget(self.card_label)
-
-        button_layout = QHBoxLayout()
-
-        edit_button = QPushButton("Edit")
-        edit_button.clicked.connect(self.edit_card)
-        button_layout.addWidget(edit_button)
-
-        self.view_answer_button = QPushButton("View Answer")
-        self.view_answer_button.clicked.connect(self.view_answer)
-        button_layout.addWidget(self.view_answer_button)
-
-        correct_button = QPushButton("Correct")
-        correct_button.setStyleSheet(
-            "background-color: #343444; color: #70a266; font-weight: bold; padding: 5px; border-radius: 3px;"
-        )
-        correct_button.clicked.connect(self.mark_correct)
-        button_layout.addWidget(correct_button)
-
-        wrong_button = QPushButton("Redo")
-        wrong_button.setStyleSheet(
-            "background-color: #343444; color: #cf6632; font-weight: bold;"
-            "font-size: 14px; padding: 5px; border-radius: 3px;"
-        )
-        wrong_button.clicked.connect(self.mark_wrong)
-        button_layout.addWidget(wrong_button)
-
-        review_layout.addLayout(button_layout)
-
-        back_button = QPushButton("Back to Main")
-        back_button.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(0))
-        review_layout.addWidget(back_button)
-
-        self.stacked_widget.addWidget(self.review_page)
-
-    def setup_wrong_answers_page(self):
-        self.wrong_answers_page = QWidget()
-        wrong_answers_layout = QVBoxLayout(self.wrong_answers_page)
-
-        self.wrong_answers_list = QListWidget()
-        wrong_answers_layout.addWidget(self.wrong_answers_list)
-
-        reset_button = QPushButton("Reset Selected to Correct")
-        reset_button.clicked.connect(self.reset_wrong_answers)
-        wrong_answers_layout.addWidget(reset_button)
-
-        back_button = QPushButton("Back to Main")
-        back_button.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(0))
-        wrong_answers_layout.addWidget(back_button)
-
-        self.stacked_widget.addWidget(self.wrong_answers_page)
-
-    def create_table(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS flashcards (
-                id INTEGER PRIMARY KEY,
-                question TEXT NOT NULL,
-                answer TEXT NOT NULL,
-                correct INTEGER DEFAULT 0,
-                wrong INTEGER DEFAULT 0
-            )
-        """)
-        self.db_connection.commit()
-
-    def save_card(self):
-        question = self.question_input.toPlainText()
-        # get answer from the text input
-        answer = self.answer_input.toPlainText()
-
-        if question and answer:
-            cursor = self.db_connection.cursor()
-            cursor.execute("INSERT INTO flashcards (question, answer) VALUES (?, ?)", (question, answer))
-            self.db_connection.commit()
-            self.question_input.clear()
-            self.answer_input.clear()
-            self.animate_save()
-
-    def animate_save(self):
-        self.animation = QPropertyAnimation(self.question_input, b"geometry")
-        self.animation.setDuration(220)
-        self.animation.setStartValue(self.question_input.geometry())
-        self.animation.setEndValue(self.question_input.geometry().translated(50, 0))
-        self.animation.setEasingCurve(QEasingCurve.InOutQuad)
-
-        self.animation2 = QPropertyAnimation(self.question_input, b"geometry")
-        self.animation2.setDuration(250)
-        self.animation2.setStartValue(self.question_input.geometry().translated(50, 0))
-        self.animation2.setEndValue(self.question_input.geometry())
-        self.animation2.setEasingCurve(QEasingCurve.InOutQuad)
-
-        self.animation.finished.connect(self.animation2.start)
-        self.animation.start()
-
-    def animate_card(self, direction):
-        if direction == "up":
-            translation = (0, -20)
-        elif direction == "down":
-            translation = (0, 10)
-        elif direction == "left":
-            translation = (-55, 0)
-        elif direction == "right":
-            translation = (55, 0)
-        else:
-            print(f"Unknown direction: {direction}")
-            return
-
-        self.animation = QPropertyAnimation(self.card_label, b"geometry")
-        self.animation.setDuration(120)
-        self.animation.setStartValue(self.card_label.geometry())
-        self.animation.setEndValue(self.card_label.geometry().translated(*translation))
-        self.animation.setEasingCurve(QEasingCurve.InOutQuad)
-
-        self.animation2 = QPropertyAnimation(self.card_label, b"geometry")
-        self.animation2.setDuration(120)
-        self.animation2.setStartValue(self.card_label.geometry().translated(*translation))
-        self.animation2.setEndValue(self.card_label.geometry())
-        self.animation2.setEasingCurve(QEasingCurve.InOutQuad)
-
-        self.animation.finished.connect(self.animation2.start)
-        self.animation.start()
-
-    def view_answer(self):
-        if self.current_card_index < len(self.current_cards):
-            card = self.current_cards[self.current_card_index]
-            answer_html = markdown.markdown(card[2])  # Convert Markdown to HTML
-            # left text align , the content / div should be in the center but just the text should be left aligne
-
-            self.card_label.setText(answer_html)  # Set the HTML text
-            self.card_label.setStyleSheet(
-                "background-color: #171b26;"
-                "border: 1px solid #6e7593;"
-                "border-radius: 15px; padding: 40px; color: #e5e6e9; font-size: 22px;"
-                "text-align: left;"
-                "font-weight: medium;"
-            )
-            self.view_answer_button.setText("Back")
-            self.view_answer_button.setStyleSheet(
-                "background-color: #6e7593; color: #171b26; font-weight: bold; padding: 5px; border-radius: 3px;"
-            )
-            self.view_answer_button.clicked.disconnect()
-            self.view_answer_button.clicked.connect(self.view_question)
-            self.animate_card("up")
-
-    def view_question(self):
-        if self.current_card_index < len(self.current_cards):
-            card = self.current_cards[self.current_card_index]
-            self.card_label.setText(card[1])  # Show question
-            self.card_label.setStyleSheet("""
-                background-color: #171b26; 
-                border-radius: 15px; 
-                padding: 50px;
-                color: #e5e6e9;
-                font-size: 22px;
-                font-weight: medium;
-            """)
-            self.view_answer_button.setText("View Answer")
-            self.view_answer_button.setStyleSheet(
-                "background-color: #343444; color: #bfb6b0; font-weight: bold; padding: 5px; border-radius: 3px;"
-            )
-            self.view_answer_button.clicked.disconnect()
-            self.view_answer_button.clicked.connect(self.view_answer)
-            self.animate_card("down")
-
-    def export_to_csv(self):
-        # Retrieve all the questions and answers from the database
-        cursor = self.db_connection.cursor()
-        cursor.execute("SELECT question, answer FROM flashcards")
-        flashcards = cursor.fetchall()
-
-        # Write them to a CSV file
-        with open('cards.csv', 'w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            # writer.writerow(["Question", "Answer"])  # Write the header
-            writer.writerows(flashcards)  # Write the data
-
-        QMessageBox.information(self, "Export Successful", "The CSV file has been successfully exported.")
-
-    def start_review(self):
-        self.current_cards = self.get_all_cards()
-        if self.current_cards:
-            random.shuffle(self.current_cards)
-            self.current_card_index = 0
-            self.show_next_card()
-            self.stacked_widget.setCurrentIndex(2)
-        else:
-            self.card_label.setText("No cards available. Add some cards first!")
-
-    def get_wrong_cards(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute("SELECT id, question, answer FROM flashcards WHERE wrong > 0")
-        return cursor.fetchall()
-
-    def start_review_wrong(self):
-        self.current_cards = self.get_wrong_cards()
-        if self.current_cards:
-            random.shuffle(self.current_cards)
-            self.current_card_index = 0
-            self.show_next_card()
-            self.stacked_widget.setCurrentIndex(2)
-        else:
-            self.card_label.setText("No wrong cards available. Mark some cards as wrong first!")
-
-    def get_all_cards(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute("SELECT id, question, answer FROM flashcards")
-        return cursor.fetchall()
-
-    # Modify your show_next_card method like this:
-    def show_next_card(self):
-
-        self.view_answer_button.setStyleSheet(
-            "background-color: #343444; color: #bfb6b0; font-weight: bold; padding: 5px; border-radius: 3px;"
-        )
-        self.view_answer_button.setText("View Answer")
-        self.card_label.setStyleSheet("""
-            background-color: #171b26; 
-            border-radius: 15px; 
-            padding: 50px;
-            color: #e5e6e9;
-            font-size: 22px;
-            font-weight: medium;
-        """)
-
-        if self.current_card_index < len(self.current_cards):
-            card = self.current_cards[self.current_card_index]
-            self.card_label.setText(card[1])  # Show question
-            self.current_card_id = card[0]
-        else:
-            # Get the number of correct answers
-            cursor = self.db_connection.cursor()
-            cursor.execute("SELECT COUNT(*) FROM flashcards WHERE correct = 1")
-            correct_answers = cursor.fetchone()[0]
-            # Update the review progress label
-            self.card_label.setFont(QFont('Arial', 22))  # Set the font to Arial with size 20
-            self.card_label.setText(f"Review completed!\n \nYou answered {correct_answers} questions correctly!")
-
-    def mark_correct(self):
-        self.update_card_status(self.current_card_id, correct=True)
-        self.animate_card("right")
-        self.next_card()
-
-    def mark_wrong(self):
-        self.update_card_status(self.current_card_id, correct=False)
-        self.animate_card("left")
-        self.next_card()
-
-    def update_card_status(self, card_id, correct):
-        cursor = self.db_connection.cursor()
-        if correct:
-            cursor.execute("UPDATE flashcards SET correct = 1 WHERE id = ?", (card_id,))
-            cursor.execute("UPDATE flashcards SET wrong = 0 WHERE id = ?", (card_id,))
-        else:
-            cursor.execute("UPDATE flashcards SET wrong = 1 WHERE id = ?", (card_id,))
-            cursor.execute("UPDATE flashcards SET correct = 0 WHERE id = ?", (card_id,))
-        self.db_connection.commit()
-
-    def next_card(self):
-        self.current_card_index += 1
-        self.show_next_card()
-
-    def edit_card(self):
-        if self.current_card_index < len(self.current_cards):
-            card = self.current_cards[self.current_card_index]
-            dialog = EditCardDialog(card[1], card[2])
-            if dialog.exec():
-                new_question, new_answer = dialog.get_data()
-                cursor = self.db_connection.cursor()
-                cursor.execute("UPDATE flashcards SET question = ?, answer = ? WHERE id = ?",
-                               (new_question, new_answer, card[0]))
-                self.db_connection.commit()
-                self.current_cards[self.current_card_index] = (card[0], new_question, new_answer)
-                self.show_next_card()
-
-    def show_wrong_answers(self):
-        self.wrong_answers_list.clear()
-        cursor = self.db_connection.cursor()
-        cursor.execute("SELECT id, question FROM flashcards WHERE wrong > 0")
-        wrong_cards = cursor.fetchall()
-        for card in wrong_cards:
-            self.wrong_answers_list.addItem(f"{card[0]}: {card[1]}")
-        self.stacked_widget.setCurrentIndex(3)
-
-    def reset_wrong_answers(self):
-        selected_items = self.wrong_answers_list.selectedItems()
-        if not selected_items:
-            return
-
-        cursor = self.db_connection.cursor()
-        for item in selected_items:
-            card_id = int(item.text().split(':')[0])
-            cursor.execute("UPDATE flashcards SET wrong = 0 WHERE id = ?", (card_id,))
-        self.db_connection.commit()
-        self.show_wrong_answers()  # Refresh the list
-
-    def import_questions(self):
-        file_name, _ = QFileDialog.getOpenFileName(self, "Select Database File", "", "SQLite Database (*.db)")
-        if file_name:
-            try:
-                import_connection = sqlite3.connect(file_name)
-                import_cursor = import_connection.cursor()
-                import_cursor.execute("SELECT question, answer FROM flashcards")
-                imported_cards = import_cursor.fetchall()
-                import_connection.close()
-
-                cursor = self.db_connection.cursor()
-                for question, answer in imported_cards:
-                    cursor.execute("SELECT COUNT(*) FROM flashcards WHERE question = ?", (question,))
-                    if cursor.fetchone()[0] == 0:
-                        cursor.execute("INSERT INTO flashcards (question, answer) VALUES (?, ?)", (question, answer))
-                self.db_connection.commit()
-
-                QMessageBox.information(self, "Import Successful", f"Imported {len(imported_cards)} unique questions.")
-            except sqlite3.Error as e:
-                QMessageBox.warning(self, "Import Failed", f"Error importing questions: {str(e)}")
-
-
-class EditCardDialog(QDialog):
-    def __init__(self, question, answer):
-        super().__init__()
-
-        self.setWindowTitle("Edit Card")
-        layout = QVBoxLayout(self)
-
-        self.question_edit = QTextEdit(question)
-        self.answer_edit = QTextEdit(answer)
-        layout.addWidget(QLabel("Question:"))
-        layout.addWidget(self.question_edit)
-        layout.addWidget(QLabel("Answer:"))
-        layout.addWidget(self.answer_edit)
-
-        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
-        buttons.accepted.connect(self.accept)
-        buttons.rejected.connect(self.reject)
-        layout.addWidget(buttons)
-
-    def get_data(self):
-        return self.question_edit.toPlainText(), self.answer_edit.toPlainText()
-
-
-if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = FlashcardApp()
-    window.resize(300, 400)
-    window.show()
-    sys.exit(app.exec())
+import sys
+import time
+from functools import partial
+from html import escape
+
+from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QScrollArea,
+                               QPushButton, QLineEdit, QLabel, QListWidget, QListWidgetItem, QStackedWidget,
+                               QDialog, QDialogButtonBox, QFileDialog, QMessageBox, QTextEdit, QFormLayout, QGroupBox,
+                               QProgressBar, QTableView, QAbstractItemView, QHeaderView,
+                               QCheckBox, QComboBox, QInputDialog, QAbstractButton, QAbstractSlider)
+from PySide6.QtCore import (Qt, QAbstractAnimation, QPropertyAnimation, QSequentialAnimationGroup, QEasingCurve,
+                            QSize, QTimer)
+from PySide6.QtGui import QColor, QIcon, QFont, QKeySequence, QShortcut
+import exporter
+import importer
+import maintenance
+import scheduler
+import stats
+import sync
+from models import CardTableModel
+from profiling import PROFILER, traced
+from render import AnswerRenderer
+from reviewlog import ReviewLog
+from session import ReviewSession
+from store import DEFAULT_DB, CardStore
+from tasks import TaskRunner
+
+# Number of due cards pulled into one review session
+SESSION_SIZE = 100
+# Answers rendered ahead of the card being shown
+PRERENDER_AHEAD = 3
+# Keep rendered answer HTML in the database between runs
+PERSIST_RENDERED_ANSWERS = False
+# Search results shown per page
+SEARCH_PAGE_SIZE = 50
+# Refresh interval of the profiling overlay
+OVERLAY_INTERVAL_MS = 250
+# Database upkeep (maintenance.py) runs once the window has had no input for
+# MAINTENANCE_IDLE_S seconds, checked every MAINTENANCE_INTERVAL_MS
+MAINTENANCE_INTERVAL_MS = 60000
+MAINTENANCE_IDLE_S = 30
+# Signals of the window's widgets that only user input emits
+INPUT_SIGNALS = ((QAbstractButton, "pressed"), (QLineEdit, "textEdited"), (QTextEdit, "textChanged"),
+                 (QComboBox, "activated"), (QAbstractSlider, "actionTriggered"), (QAbstractItemView, "clicked"),
+                 (QShortcut, "activated"))
+# How far the card nudges for each action
+CARD_MOVES = {"up": (0, -20), "down": (0, 10), "left": (-55, 0), "right": (55, 0)}
+
+
+class FlashcardApp(QMainWindow):
+    def __init__(self, db_path=DEFAULT_DB):
+        super().__init__()
+        self.setWindowTitle("Open Flashcards")
+        self.setMinimumWidth(600)
+        self.setStyleSheet("""
+            QMainWindow, QWidget {
+                background-color: #0d101d;
+                color: #FFFFFF;
+            }
+            QPushButton {
+                background-color: #343444;
+                color: #bfb6b0;
+                border: none;
+                font-size: 13px;
+                font-weight: bold;
+                padding: 5px;
+                height: 50px;
+                border-radius: 3px;
+            }
+            QPushButton:hover {
+                background-color: #484857;
+            }
+            QLineEdit {
+                background-color: #3D3D3D;
+                color: #FFFFFF;
+                border: 1px solid #5A5A5A;
+                padding: 3px;
+            }
+            QListWidget, QTableView {
+                background-color: #333742;
+                color: #e5e6e9;
+                border: 1px solid #5A5A5A;
+            }
+            QHeaderView::section {
+                background-color: #343444;
+                color: #bfb6b0;
+                border: none;
+                padding: 3px;
+            }
+            QGroupBox {
+                border: 1px solid #454951;
+                border-radius: 5px;
+                margin-top: 10px;
+            }
+            QGroupBox::title {
+                subcontrol-origin: margin;
+                subcontrol-position: top left;
+                color: #bfb6b0;
+                padding: 5px;
+            }
+            QLabel#card {
+                background-color: #171b26;
+                border-radius: 15px;
+                padding: 50px;
+                color: #e5e6e9;
+                font-size: 22px;
+                font-weight: medium;
+            }
+            QLabel#card[side="answer"] {
+                border: 1px solid #6e7593;
+                padding: 40px;
+            }
+            QPushButton#flip:checked {
+                background-color: #6e7593;
+                color: #171b26;
+            }
+            QPushButton#correct {
+                color: #70a266;
+            }
+            QPushButton#redo {
+                color: #cf6632;
+                font-size: 14px;
+            }
+        """)
+
+        self.central_widget = QWidget()
+        self.setCentralWidget(self.central_widget)
+        self.layout = QVBoxLayout(self.central_widget)
+
+        self.stacked_widget = QStackedWidget()
+        self.layout.addWidget(self.stacked_widget)
+
+        self.store = CardStore(db_path)
+        self.session = ReviewSession(self.store, [])
+        self.session_started_at = int(time.time())
+        self.renderer = AnswerRenderer(self.store, persist=PERSIST_RENDERED_ANSWERS)
+        self.review_log = ReviewLog(self.store)
+        self.card_shown_at = time.monotonic()
+        self.tasks = TaskRunner(self, cleanup=self.store.release_connection)
+        self.setup_status_bar()
+
+        self.setup_main_page()
+        self.setup_add_card_page()
+        self.setup_review_page()
+        self.setup_wrong_answers_page()
+        self.setup_search_page()
+        self.setup_stats_page()
+        self.show_decks(self.store.decks(), self.store.tags())
+        self.setup_maintenance()
+
+        if PROFILER.enabled:
+            self.debug_overlay = DebugOverlay(self.central_widget)
+            QShortcut(QKeySequence("F12"), self).activated.connect(self.debug_overlay.toggle)
+
+    def setup_main_page(self):
+        main_page = QWidget()
+        main_layout = QVBoxLayout(main_page)
+
+        # Create a group box for each section
+        add_card_group = QGroupBox()
+        review_group = QGroupBox()
+        wrong_answers_group = QGroupBox()
+        import_group = QGroupBox()
+        main_heading = QLabel("Open Flashcards")
+        main_heading.setStyleSheet("font-size: 22px; font-weight: bold; color: #bfb6b0;")
+        main_heading.setAlignment(Qt.AlignCenter)
+
+        # Create a form layout for each group box
+        add_card_layout = QFormLayout(add_card_group)
+        review_layout = QFormLayout(review_group)
+        wrong_answers_layout = QFormLayout(wrong_answers_group)
+        import_layout = QFormLayout(import_group)
+        import_layout.setAlignment(Qt.AlignmentFlag.AlignBottom)
+
+        # Create buttons and add them to the form layouts
+        add_button = QPushButton("Add New Cards")
+        icon = QIcon('add_dict.png')
+        icon.addFile('add_dict.png', QSize(45, 45))
+        add_button.setIcon(icon)
+        add_button.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(1))
+        add_card_layout.addRow(add_button)
+
+        # Deck and tag filters for reviews, the wrong answers list and exports
+        self.deck_filter = QComboBox()
+        self.tag_filter = QComboBox()
+        review_layout.addRow("Deck:", self.deck_filter)
+        review_layout.addRow("Tag:", self.tag_filter)
+
+        review_button = QPushButton("Start Flashcards")
+        review_button.clicked.connect(self.start_review)
+        review_layout.addRow(review_button)
+
+        review_wrong_button = QPushButton("Open redo cards")
+        review_wrong_button.clicked.connect(self.start_review_wrong)
+        review_layout.addRow(review_wrong_button)
+
+        wrong_answers_button = QPushButton("View")
+        wrong_answers_button.clicked.connect(self.show_wrong_answers)
+        wrong_answers_layout.addRow(wrong_answers_button)
+
+        search_button = QPushButton("Search Cards")
+        search_button.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(4))
+        wrong_answers_layout.addRow(search_button)
+
+        stats_button = QPushButton("Statistics")
+        stats_button.clicked.connect(self.show_stats)
+        wrong_answers_layout.addRow(stats_button)
+
+        import_button = QPushButton("Import Database")
+        import_button.clicked.connect(self.import_questions)
+        import_layout.addRow(import_button)
+
+        import_dict_button = QPushButton("Import Dictionary")
+        import_dict_button.clicked.connect(self.import_dictionary)
+        import_layout.addRow(import_dict_button)
+
+        export_button = QPushButton("Export Cards")
+        export_button.clicked.connect(self.export_cards)
+        import_layout.addRow(export_button)
+
+        sync_button = QPushButton("Sync")
+        sync_button.clicked.connect(self.sync_cards)
+        import_layout.addRow(sync_button)
+
+        # Add the group boxes to the main layout
+        main_layout.addWidget(main_heading)
+        main_layout.addWidget(add_card_group)
+        main_layout.addWidget(review_group)
+        main_layout.addWidget(wrong_answers_group)
+        main_layout.addWidget(import_group)
+
+        self.stacked_widget.addWidget(main_page)
+
+    def setup_status_bar(self):
+        # Progress of background jobs; the rest of the window stays usable meanwhile
+        self.task_label = QLabel()
+        self.task_progress = QProgressBar()
+        self.task_progress.setMaximumWidth(200)
+        self.cancel_tasks_button = QPushButton("Cancel")
+        self.cancel_tasks_button.clicked.connect(self.tasks.cancel_all)
+
+        status_bar = self.statusBar()
+        status_bar.addWidget(self.task_label, 1)
+        status_bar.addPermanentWidget(self.task_progress)
+        status_bar.addPermanentWidget(self.cancel_tasks_button)
+        self.tasks.active_changed.connect(self.update_task_status)
+        self.update_task_status(0)
+
+    def update_task_status(self, active):
+        self.task_progress.setVisible(active > 0)
+        self.cancel_tasks_button.setVisible(active > 0)
+        if not active:
+            self.task_label.clear()
+            self.task_progress.reset()
+
+    def setup_maintenance(self):
+        # Input is noticed through the widgets' own signals; an application-wide
+        # event filter would route every Qt event (paints, timers) through Python
+        self.last_input = time.monotonic()
+        for widget_type, signal in INPUT_SIGNALS:
+            for widget in self.findChildren(widget_type):
+                getattr(widget, signal).connect(self.note_input)
+        self.maintenance_timer = QTimer(self)
+        self.maintenance_timer.setInterval(MAINTENANCE_INTERVAL_MS)
+        self.maintenance_timer.timeout.connect(self.run_idle_maintenance)
+        self.maintenance_timer.start()
+
+    def note_input(self, *_):
+        self.last_input = time.monotonic()
+
+    def run_idle_maintenance(self):
+        if self.tasks.tasks or time.monotonic() - self.last_input < MAINTENANCE_IDLE_S:
+            return
+        self.tasks.start(lambda progress: (self.review_log.flush(), maintenance.run(self.store))[1],
+                         on_error=lambda e: self.statusBar().showMessage(f"Database maintenance failed: {e}", 10000))
+
+    def task_progress_reporter(self, message):
+        def report(done, total):
+            self.task_label.setText(f"{message}: {done}/{total}")
+            self.task_progress.setMaximum(max(total, 1))
+            self.task_progress.setValue(done)
+        return report
+
+    def task_cancelled(self, message):
+        self.statusBar().showMessage(message, 3000)
+
+    def refresh_decks(self):
+        # Counting the cards of every deck and tag reads the whole deck, so it runs in the background
+        self.tasks.start(lambda progress: (self.store.decks(), self.store.tags()),
+                         on_result=lambda result: self.show_decks(*result), on_error=self.show_query_error)
+
+    def show_decks(self, decks, tags):
+        # Reload the deck and tag choices, keeping the current selections
+        deck, tag = self.deck_filter.currentData(), self.tag_filter.currentData()
+        self.deck_names = {name for _, name, _ in decks}
+        self.tag_names = {name for _, name, _ in tags}
+        self.deck_filter.clear()
+        self.deck_filter.addItem("All decks", None)
+        for deck_id, name, count in decks:
+            self.deck_filter.addItem(f"{name} ({count})", deck_id)
+        self.tag_filter.clear()
+        self.tag_filter.addItem("Any tag", None)
+        for tag_id, name, count in tags:
+            self.tag_filter.addItem(f"{name} ({count})", tag_id)
+        self.deck_filter.setCurrentIndex(max(self.deck_filter.findData(deck), 0))
+        self.tag_filter.setCurrentIndex(max(self.tag_filter.findData(tag), 0))
+        current_deck = self.deck_input.currentText()
+        self.deck_input.clear()
+        self.deck_input.addItems([name for _, name, _ in decks])
+        self.deck_input.setCurrentText(current_deck or "Default")
+
+    def select_filters(self, deck=None, tag=None):
+        # Select a deck and tag by name, as given on the command line
+        for combo, name in ((self.deck_filter, deck), (self.tag_filter, tag)):
+            if name is not None:
+                for index in range(1, combo.count()):
+                    if combo.itemText(index).rsplit(" (", 1)[0] == name:
+                        combo.setCurrentIndex(index)
+
+    def card_filters(self):
+        return {"deck_id": self.deck_filter.currentData(), "tag_id": self.tag_filter.currentData()}
+
+    def ask_import_deck(self):
+        # Deck name for imported cards; typing a new name creates the deck
+        names = sorted(self.deck_names)
+        name, ok = QInputDialog.getItem(self, "Import", "Import into deck:", names,
+                                        names.index("Default") if "Default" in names else 0, True)
+        name = name.strip()
+        return self.store.deck_id(name, create=True) if ok and name else None
+
+    def finish_import(self, message):
+        self.refresh_decks()
+        QMessageBox.information(self, "Import Successful", message)
+
+    def import_dictionary(self):
+        # A JSON array or JSON Lines file of {"question": ..., "answer": ...} objects
+        file_name, _ = QFileDialog.getOpenFileName(self, "Select Dictionary File", "",
+                                                   "JSON Dictionary (*.json *.jsonl)")
+        deck_id = self.ask_import_deck() if file_name else None
+        if deck_id is not None:
+            self.tasks.start(
+                importer.import_dictionary_file, self.store, file_name, deck_id,
+                on_progress=self.task_progress_reporter("Importing dictionary"),
+                on_result=self.show_dictionary_import,
+                on_error=lambda e: QMessageBox.warning(self, "Import Failed", str(e)),
+                on_cancelled=lambda: self.task_cancelled("Dictionary import cancelled"),
+            )
+
+    def show_dictionary_import(self, result):
+        message = (f"Imported {result.inserted} questions.\n"
+                   f"{result.duplicates} duplicates skipped, {result.error_count} invalid rows.")
+        if result.errors:
+            message += "\n\n" + "\n".join(f"Row {row}: {error}" for row, error in result.errors[:10])
+            if result.error_count > 10:
+                message += f"\n... and {result.error_count - 10} more"
+        self.finish_import(message)
+
+    def setup_add_card_page(self):
+        add_card_page = QWidget()
+        add_card_layout = QVBoxLayout(add_card_page)
+
+        self.question_input = QTextEdit()
+        self.question_input.setPlaceholderText("Enter question")
+        add_card_layout.addWidget(self.question_input)
+        self.save_animation = Bounce(self.question_input, 220, 250)
+
+        self.answer_input = QTextEdit()
+        self.answer_input.setPlaceholderText("Enter answer")
+        add_card_layout.addWidget(self.answer_input)
+
+        # Typing a deck name that does not exist yet creates the deck on save
+        details_layout = QFormLayout()
+        self.deck_input = QComboBox()
+        self.deck_input.setEditable(True)
+        details_layout.addRow("Deck:", self.deck_input)
+        self.tags_input = QLineEdit()
+        self.tags_input.setPlaceholderText("comma-separated tags")
+        details_layout.addRow("Tags:", self.tags_input)
+        add_card_layout.addLayout(details_layout)
+
+        save_button = QPushButton("Save Card")
+        save_button.clicked.connect(self.save_card)
+        add_card_layout.addWidget(save_button)
+
+        back_button = QPushButton("Back to Main")
+        back_button.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(0))
+        add_card_layout.addWidget(back_button)
+
+        self.stacked_widget.addWidget(add_card_page)
+
+    def setup_review_page(self):
+        self.review_page = QWidget()
+        review_layout = QVBoxLayout(self.review_page)
+
+        # The card is styled by selector on its "side" property and the flip
+        # button by its checked state (see the window stylesheet), so flipping
+        # never parses CSS
+        self.card_label = QLabel("Question will appear here")
+        self.card_label.setObjectName("card")
+        self.card_label.setProperty("side", "question")
+        self.card_label.setWordWrap(True)
+        self.card_label.setAlignment(Qt.AlignCenter)
+        review_layout.addWidget(self.card_label)
+        self.card_animation = Bounce(self.card_label, 120, 120)
+
+        button_layout = QHBoxLayout()
+
+        edit_button = QPushButton("Edit")
+        edit_button.clicked.connect(self.edit_card)
+        button_layout.addWidget(edit_button)
+
+        self.view_answer_button = QPushButton("View Answer")
+        self.view_answer_button.setObjectName("flip")
+        self.view_answer_button.setCheckable(True)
+        self.view_answer_button.clicked.connect(self.flip_card)
+        button_layout.addWidget(self.view_answer_button)
+
+        correct_button = QPushButton("Correct")
+        correct_button.setObjectName("correct")
+        correct_button.clicked.connect(self.mark_correct)
+        button_layout.addWidget(correct_button)
+
+        wrong_button = QPushButton("Redo")
+        wrong_button.setObjectName("redo")
+        wrong_button.clicked.connect(self.mark_wrong)
+        button_layout.addWidget(wrong_button)
+
+        review_layout.addLayout(button_layout)
+
+        back_button = QPushButton("Back to Main")
+        back_button.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(0))
+        review_layout.addWidget(back_button)
+
+        self.stacked_widget.addWidget(self.review_page)
+
+    def setup_wrong_answers_page(self):
+        self.wrong_answers_page = QWidget()
+        wrong_answers_layout = QVBoxLayout(self.wrong_answers_page)
+
+        self.wrong_answers_model = CardTableModel(
+            lambda *page: self.store.wrong_page(*page, **self.card_filters()), parent=self)
+        self.wrong_answers_list = QTableView()
+        self.wrong_answers_list.setModel(self.wrong_answers_model)
+        self.wrong_answers_list.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.wrong_answers_list.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.wrong_answers_list.setSortingEnabled(True)
+        self.wrong_answers_list.sortByColumn(0, Qt.AscendingOrder)
+        self.wrong_answers_list.verticalHeader().hide()
+        self.wrong_answers_list.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        wrong_answers_layout.addWidget(self.wrong_answers_list)
+
+        reset_button = QPushButton("Reset Selected to Correct")
+        reset_button.clicked.connect(self.reset_wrong_answers)
+        wrong_answers_layout.addWidget(reset_button)
+
+        back_button = QPushButton("Back to Main")
+        back_button.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(0))
+        wrong_answers_layout.addWidget(back_button)
+
+        self.stacked_widget.addWidget(self.wrong_answers_page)
+
+    def setup_search_page(self):
+        self.search_page = QWidget()
+        search_layout = QVBoxLayout(self.search_page)
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search questions and answers")
+        search_layout.addWidget(self.search_input)
+
+        self.search_results = QListWidget()
+        self.search_results.itemActivated.connect(self.review_search_result)
+        search_layout.addWidget(self.search_results)
+
+        paging_layout = QHBoxLayout()
+        self.search_previous_button = QPushButton("Previous")
+        self.search_previous_button.clicked.connect(lambda: self.run_search(self.search_offset - SEARCH_PAGE_SIZE))
+        paging_layout.addWidget(self.search_previous_button)
+        self.search_status = QLabel()
+        self.search_status.setAlignment(Qt.AlignCenter)
+        paging_layout.addWidget(self.search_status, 1)
+        self.search_next_button = QPushButton("Next")
+        self.search_next_button.clicked.connect(lambda: self.run_search(self.search_offset + SEARCH_PAGE_SIZE))
+        paging_layout.addWidget(self.search_next_button)
+        search_layout.addLayout(paging_layout)
+
+        back_button = QPushButton("Back to Main")
+        back_button.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(0))
+        search_layout.addWidget(back_button)
+
+        # Search once typing pauses rather than on every keystroke
+        self.search_offset = 0
+        self.search_generation = 0
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(lambda: self.run_search(0))
+        self.search_input.textChanged.connect(self.search_timer.start)
+        self.show_search_results(self.search_generation, ([], 0), 0)
+
+        self.stacked_widget.addWidget(self.search_page)
+
+    def setup_stats_page(self):
+        self.stats_page = QWidget()
+        stats_layout = QVBoxLayout(self.stats_page)
+
+        self.stats_label = QLabel()
+        self.stats_label.setTextFormat(Qt.RichText)
+        self.stats_label.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        self.stats_label.setWordWrap(True)
+        stats_scroll = QScrollArea()
+        stats_scroll.setWidgetResizable(True)
+        stats_scroll.setWidget(self.stats_label)
+        stats_layout.addWidget(stats_scroll)
+
+        back_button = QPushButton("Back to Main")
+        back_button.clicked.connect(lambda: self.stacked_widget.setCurrentIndex(0))
+        stats_layout.addWidget(back_button)
+
+        self.stacked_widget.addWidget(self.stats_page)
+
+    def show_stats(self):
+        self.tasks.start(lambda progress: (self.review_log.flush(), stats.deck_report(self.store))[1],
+                         on_result=self.fill_stats, on_error=self.show_query_error)
+
+    @traced("fill_stats", "ui")
+    def fill_stats(self, report):
+        summary = report["summary"]
+        retention = summary["retention_30d"]
+        html = ["<h2>Deck</h2><table cellpadding='3'>"]
+        for label, value in (("Cards", summary["cards"]), ("Due now", summary["due"]), ("New", summary["new"]),
+                             ("Marked wrong", summary["wrong"]), ("Reviews today", summary["reviews_today"]),
+                             ("Reviews (30 days)", summary["reviews_30d"]),
+                             ("Retention (30 days)", "-" if retention is None else f"{retention:.0%}")):
+            html.append(f"<tr><td>{label}</td><td align='right'>{value}</td></tr>")
+        html.append("</table><h2>Due in the next 14 days</h2><table cellpadding='3'><tr>")
+        html.extend(f"<td align='center'>{'Today' if day == 0 else f'+{day}'}<br>{count}</td>"
+                    for day, count in enumerate(report["forecast"]))
+        html.append("</tr></table><h2>Last 14 days</h2><table cellpadding='3'>")
+        for day_start, reviews, passed, response_ms in reversed(report["history"]):
+            if reviews:
+                html.append(f"<tr><td>{time.strftime('%a %d %b', time.gmtime(day_start))}</td>"
+                            f"<td align='right'>{reviews} reviews</td><td align='right'>{passed / reviews:.0%}</td>"
+                            f"<td align='right'>{response_ms / 1000:.1f} s</td></tr>")
+        html.append("</table><h2>Retention by days since last review</h2><table cellpadding='3'>")
+        for bound, answers, rate in report["retention"]:
+            if answers:
+                html.append(f"<tr><td>{bound}+ days</td><td align='right'>{answers} answers</td>"
+                            f"<td align='right'>{rate:.0%}</td></tr>")
+        html.append("</table><h2>Hardest cards</h2><table cellpadding='3'>")
+        for card_id, question, reviews, difficulty in report["hardest"]:
+            html.append(f"<tr><td>{escape(question)}</td><td align='right'>{difficulty:.0%} of {reviews}</td></tr>")
+        html.append("</table>")
+        self.stats_label.setText("".join(html))
+        self.stacked_widget.setCurrentIndex(5)
+
+    def run_search(self, offset):
+        text = self.search_input.text()
+        self.search_generation += 1
+        self.tasks.start(
+            lambda progress: (self.store.search(text, SEARCH_PAGE_SIZE, max(offset, 0)), self.store.search_count(text)),
+            on_result=partial(self.show_search_results, self.search_generation, offset=max(offset, 0)),
+            on_error=lambda e: self.search_status.setText(f"Search failed: {e}"),
+        )
+
+    @traced("show_search_results", "ui")
+    def show_search_results(self, generation, result, offset):
+        if generation != self.search_generation:
+            return  # a newer search is already on its way
+        rows, total = result
+        self.search_offset = offset
+        self.search_results.clear()
+        for card_id, question, answer in rows:
+            item = QListWidgetItem(f"{question}\n    {answer}")
+            item.setData(Qt.UserRole, card_id)
+            self.search_results.addItem(item)
+        if total:
+            self.search_status.setText(f"{offset + 1}-{offset + len(rows)} of {total}")
+        else:
+            self.search_status.setText("No matches" if self.search_input.text().strip() else "")
+        self.search_previous_button.setEnabled(offset > 0)
+        self.search_next_button.setEnabled(offset + len(rows) < total)
+
+    def review_search_result(self, item):
+        self.begin_review([item.data(Qt.UserRole)], empty_message="Card not found.")
+
+    @traced("save_card", "ui")
+    def save_card(self):
+        question = self.question_input.toPlainText()
+        # get answer from the text input
+        answer = self.answer_input.toPlainText()
+
+        if question and answer:
+            deck = self.deck_input.currentText().strip() or "Default"
+            tags = split_tags(self.tags_input.text())
+            if self.store.add_card(question, answer, self.store.deck_id(deck, create=True), tags,
+                                   allow_files=True) is None:
+                QMessageBox.warning(self, "Duplicate Card", "A card with this question already exists in this deck.")
+                return
+            self.question_input.clear()
+            self.answer_input.clear()
+            # The choices only change for a new deck or tag; counts catch up at the next refresh
+            if deck not in self.deck_names or not self.tag_names.issuperset(tags):
+                self.refresh_decks()
+            self.animate_save()
+
+    def animate_save(self):
+        self.save_animation.start(50, 0)
+
+    def animate_card(self, direction):
+        self.card_animation.start(*CARD_MOVES[direction])
+
+    def show_side(self, side):
+        # The button only changes pseudo-state; the card re-polishes against
+        # the already parsed window stylesheet
+        self.view_answer_button.setChecked(side == "answer")
+        if self.card_label.property("side") == side:
+            return
+        self.card_label.setProperty("side", side)
+        self.card_label.style().unpolish(self.card_label)
+        self.card_label.style().polish(self.card_label)
+        self.view_answer_button.setText("Back" if side == "answer" else "View Answer")
+
+    def flip_card(self):
+        # Clicking has already toggled the button, so go by the card's side
+        if self.card_label.property("side") == "answer":
+            self.view_question()
+        else:
+            self.view_answer()
+        self.view_answer_button.setChecked(self.card_label.property("side") == "answer")
+
+    @traced("view_answer", "ui")
+    def view_answer(self):
+        card = self.session.current()
+        if card is not None:
+            answer_html = self.renderer.render(card)  # Convert Markdown to HTML (usually prerendered)
+            # left text align , the content / div should be in the center but just the text should be left aligne
+
+            self.card_label.setText(answer_html)  # Set the HTML text
+            with PROFILER.span("restyle", "ui"):
+                self.show_side("answer")
+            self.animate_card("up")
+
+    @traced("view_question", "ui")
+    def view_question(self):
+        card = self.session.current()
+        if card is not None:
+            self.card_label.setText(card[1])  # Show question
+            with PROFILER.span("restyle", "ui"):
+                self.show_side("question")
+            self.animate_card("down")
+
+    def export_cards(self):
+        dialog = ExportDialog(self.deck_filter.currentText(), self.tag_filter.currentText())
+        if not dialog.exec():
+            return
+        file_name, _ = QFileDialog.getSaveFileName(
+            self, "Export Cards", "cards.csv",
+            "CSV (*.csv);;JSON Lines (*.jsonl);;Compressed CSV (*.csv.gz);;Compressed JSON Lines (*.jsonl.gz)")
+        if not file_name:
+            return
+        self.tasks.start(
+            exporter.export_cards, self.store, file_name, **dialog.get_options(), **self.card_filters(),
+            on_progress=self.task_progress_reporter("Exporting"),
+            on_result=lambda count: QMessageBox.information(self, "Export Successful",
+                                                            f"Exported {count} cards to {file_name}."),
+            on_error=lambda e: QMessageBox.warning(self, "Export Failed", f"Error exporting cards: {e}"),
+            on_cancelled=lambda: self.task_cancelled("Export cancelled"),
+        )
+
+    def sync_cards(self):
+        # Exchange changes with a sync server (cli.py sync-server), remembering its address
+        url, ok = QInputDialog.getText(self, "Sync", "Sync server address:",
+                                       text=self.store.meta("server_url", f"http://127.0.0.1:{sync.DEFAULT_PORT}"))
+        url = url.strip()
+        if not ok or not url:
+            return
+        self.tasks.start(
+            lambda progress: (self.review_log.flush(), sync.sync(self.store, url, progress))[1],
+            on_progress=self.task_progress_reporter("Syncing"),
+            on_result=self.finish_sync,
+            on_error=lambda e: QMessageBox.warning(self, "Sync Failed", str(e)),
+            on_cancelled=lambda: self.task_cancelled("Sync cancelled"),
+        )
+
+    def finish_sync(self, result):
+        self.refresh_decks()
+        self.statusBar().showMessage(f"Synced: {result}", 10000)
+
+    def start_review(self):
+        filters = self.card_filters()
+        self.tasks.start(lambda progress: self.get_due_card_ids(**filters),
+                         on_result=partial(self.begin_review,
+                                           empty_message="No cards due. Add some cards or come back later!"),
+                         on_error=self.show_query_error)
+
+    @traced("begin_review", "ui")
+    def begin_review(self, card_ids, empty_message, shuffle=False):
+        self.session = ReviewSession(self.store, card_ids, shuffle=shuffle)
+        self.session_started_at = int(time.time())
+        if self.session:
+            self.show_next_card()
+            self.stacked_widget.setCurrentIndex(2)
+        else:
+            self.card_label.setText(empty_message)
+
+    def show_query_error(self, error):
+        QMessageBox.warning(self, "Database Error", str(error))
+
+    def get_wrong_card_ids(self, **filters):
+        self.review_log.flush()
+        return self.store.wrong_card_ids(**filters)
+
+    def start_review_wrong(self):
+        filters = self.card_filters()
+        self.tasks.start(lambda progress: self.get_wrong_card_ids(**filters),
+                         on_result=partial(self.begin_review,
+                                           empty_message="No wrong cards available. Mark some cards as wrong first!",
+                                           shuffle=True),
+                         on_error=self.show_query_error)
+
+    def get_due_card_ids(self, **filters):
+        # Pending answers move cards in the due queue, so apply them first
+        self.review_log.flush()
+        return self.store.due_card_ids(SESSION_SIZE, **filters)
+
+    # Modify your show_next_card method like this:
+    @traced("show_next_card", "ui")
+    def show_next_card(self):
+
+        with PROFILER.span("restyle", "ui"):
+            self.show_side("question")
+
+        card = self.session.current()
+        if card is not None:
+            self.card_label.setText(card[1])  # Show question
+            self.current_card_id = card[0]
+            self.card_shown_at = time.monotonic()
+            self.renderer.prefetch([card] + self.session.upcoming(PRERENDER_AHEAD))
+        else:
+            # Summarise the answers given in this session
+            self.review_log.flush()
+            summary = stats.session_summary(self.store, self.session_started_at)
+            # Update the review progress label
+            self.card_label.setFont(QFont('Arial', 22))  # Set the font to Arial with size 20
+            self.card_label.setText(f"Review completed!\n \nYou answered {summary['passed']} of "
+                                    f"{summary['reviews']} questions correctly!")
+
+    @traced("mark_correct", "ui")
+    def mark_correct(self):
+        if self.session.current() is None:
+            return
+        self.update_card_status(self.current_card_id, correct=True)
+        self.animate_card("right")
+        self.next_card()
+
+    @traced("mark_wrong", "ui")
+    def mark_wrong(self):
+        if self.session.current() is None:
+            return
+        self.update_card_status(self.current_card_id, correct=False)
+        self.animate_card("left")
+        self.next_card()
+
+    def update_card_status(self, card_id, correct):
+        response_ms = int((time.monotonic() - self.card_shown_at) * 1000)
+        self.review_log.record(card_id, scheduler.GRADE_GOOD if correct else scheduler.GRADE_AGAIN, response_ms)
+
+    def next_card(self):
+        self.session.advance()
+        self.show_next_card()
+
+    @traced("edit_card", "ui")
+    def edit_card(self):
+        card = self.session.current()
+        if card is not None:
+            dialog = EditCardDialog(card[1], self.store.answer_text(card), self.store.card_tags(card[0]))
+            if dialog.exec():
+                new_question, new_answer, tags = dialog.get_data()
+                with self.store.transaction():
+                    self.store.update_card(card[0], new_question, new_answer, allow_files=True)
+                    self.store.set_card_tags(card[0], tags)
+                if not self.tag_names.issuperset(tags):
+                    self.refresh_decks()
+                self.session.replace_current((card[0], new_question, new_answer, None))
+                self.show_next_card()
+
+    def show_wrong_answers(self):
+        # Apply pending answers first so the list reflects the latest grades
+        self.tasks.start(lambda progress: self.review_log.flush(),
+                         on_result=lambda _: self.open_wrong_answers(), on_error=self.show_query_error)
+
+    @traced("open_wrong_answers", "ui")
+    def open_wrong_answers(self):
+        self.wrong_answers_model.refresh()
+        self.stacked_widget.setCurrentIndex(3)
+
+    @traced("reset_wrong_answers", "ui")
+    def reset_wrong_answers(self):
+        selected_rows = self.wrong_answers_list.selectionModel().selectedRows()
+        if not selected_rows:
+            return
+
+        self.store.reset_wrong(self.wrong_answers_model.card_id(index.row()) for index in selected_rows)
+        self.wrong_answers_model.refresh()  # Refresh the list
+
+    def import_questions(self):
+        file_name, _ = QFileDialog.getOpenFileName(self, "Select Database File", "", "SQLite Database (*.db)")
+        deck_id = self.ask_import_deck() if file_name else None
+        if deck_id is not None:
+            self.tasks.start(
+                importer.import_database, self.store, file_name, deck_id,
+                on_progress=self.task_progress_reporter("Importing cards"),
+                on_result=lambda result: self.finish_import(f"Imported {result[1]} unique questions."),
+                on_error=lambda e: QMessageBox.warning(self, "Import Failed", f"Error importing questions: {str(e)}"),
+                on_cancelled=lambda: self.task_cancelled("Import cancelled"),
+            )
+
+    def closeEvent(self, event):
+        self.maintenance_timer.stop()
+        self.tasks.cancel_all()
+        self.tasks.wait()
+        self.renderer.close()
+        try:
+            self.review_log.close()
+        except Exception as e:
+            QMessageBox.warning(self, "Answers Not Saved",
+                                f"{self.review_log.pending()} review answers could not be saved: {e}")
+        finally:
+            self.store.close()
+        super().closeEvent(event)
+
+
+class Bounce:
+    """Nudges a widget by an offset and back, reusing one pair of geometry animations."""
+
+    def __init__(self, widget, out_ms, back_ms):
+        self.widget = widget
+        self.home = None
+        self.group = QSequentialAnimationGroup(widget)
+        self.out = QPropertyAnimation(widget, b"geometry", self.group)
+        self.back = QPropertyAnimation(widget, b"geometry", self.group)
+        for animation, duration in ((self.out, out_ms), (self.back, back_ms)):
+            animation.setDuration(duration)
+            animation.setEasingCurve(QEasingCurve.InOutQuad)
+            self.group.addAnimation(animation)
+
+    def start(self, dx, dy):
+        # A bounce still running is cut short; the new one starts from the rest position
+        if self.group.state() == QAbstractAnimation.Running:
+            self.group.stop()
+        else:
+            self.home = self.widget.geometry()
+        moved = self.home.translated(dx, dy)
+        self.out.setStartValue(self.home)
+        self.out.setEndValue(moved)
+        self.back.setStartValue(moved)
+        self.back.setEndValue(self.home)
+        self.group.start()
+
+
+class DebugOverlay(QLabel):
+    """Time spent per profiling category since the last refresh, over the window."""
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setStyleSheet("background-color: rgba(0, 0, 0, 180); color: #9fe870; "
+                           "font-family: monospace; font-size: 11px; padding: 4px;")
+        self.move(4, 4)
+        self.setText("profiling (F12 hides)")
+        self.adjustSize()
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.start(OVERLAY_INTERVAL_MS)
+
+    def refresh(self):
+        # Keeps showing the last busy frame until something else happens
+        frame = PROFILER.take_frame()
+        if not frame:
+            return
+        counters = PROFILER.counters
+        lines = [f"{category:<7}{ms:8.2f} ms  x{spans}" for category, (ms, spans) in sorted(frame.items())]
+        lines.append(f"commits {counters.get('db.commits', 0)}  renders {counters.get('render.markdown', 0)}  "
+                     f"slow queries {counters.get('sqlite.slow_statements', 0)}")
+        self.setText("\n".join(lines))
+        self.adjustSize()
+        self.raise_()
+
+    def toggle(self):
+        self.setVisible(not self.isVisible())
+
+
+class ExportDialog(QDialog):
+    def __init__(self, deck, tag):
+        super().__init__()
+
+        self.setWindowTitle("Export Cards")
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"Deck: {deck}\nTag: {tag}"))
+
+        self.stats_check = QCheckBox("Include review statistics")
+        self.header_check = QCheckBox("Write a header row (CSV)")
+        self.wrong_only_check = QCheckBox("Only cards marked wrong")
+        self.due_only_check = QCheckBox("Only cards due now")
+        for check in (self.stats_check, self.header_check, self.wrong_only_check, self.due_only_check):
+            layout.addWidget(check)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def get_options(self):
+        return {
+            "stats": self.stats_check.isChecked(),
+            "header": self.header_check.isChecked(),
+            "wrong_only": self.wrong_only_check.isChecked(),
+            "due_only": self.due_only_check.isChecked(),
+        }
+
+
+class EditCardDialog(QDialog):
+    def __init__(self, question, answer, tags=()):
+        super().__init__()
+
+        self.setWindowTitle("Edit Card")
+        layout = QVBoxLayout(self)
+
+        self.question_edit = QTextEdit(question)
+        self.answer_edit = QTextEdit(answer)
+        layout.addWidget(QLabel("Question:"))
+        layout.addWidget(self.question_edit)
+        layout.addWidget(QLabel("Answer:"))
+        layout.addWidget(self.answer_edit)
+        self.tags_edit = QLineEdit(", ".join(tags))
+        layout.addWidget(QLabel("Tags:"))
+        layout.addWidget(self.tags_edit)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    def get_data(self):
+        return self.question_edit.toPlainText(), self.answer_edit.toPlainText(), split_tags(self.tags_edit.text())
+
+
+def split_tags(text):
+    return [tag.strip() for tag in text.split(",") if tag.strip()]
+
+
+def main(db_path=DEFAULT_DB, start_review=False, deck=None, tag=None):
+    app = QApplication(sys.argv)
+    window = FlashcardApp(db_path)
+    window.resize(300, 400)
+    window.select_filters(deck, tag)
+    window.show()
+    if start_review:
+        window.start_review()
+    return app.exec()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
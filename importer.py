@@ -0,0 +1,178 @@
+import codecs
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+import blobs
+from store import DEFAULT_DECK
+
+CHUNK_SIZE = 5000
+READ_BLOCK = 1 << 16
+MAX_REPORTED_ERRORS = 100
+
+
+def import_database(store, file_name, deck_id=DEFAULT_DECK, chunk_size=CHUNK_SIZE, progress=None):
+    """Merge the cards of another flashcards database into a deck of ``store``.
+
+    The source deck is streamed in chunks of ``chunk_size`` rows, each chunk
+    is written in one transaction and questions already in the deck (after
+    whitespace/case normalization) are skipped. ``progress(done, total)`` is
+    called after every chunk. Returns ``(read, inserted)``.
+    """
+    # as_uri() escapes "#", "?" and "%" in the name, which would end the path in a URI
+    source = sqlite3.connect(Path(file_name).resolve().as_uri() + "?mode=ro", uri=True)
+    try:
+        total = source.execute("SELECT COUNT(*) FROM flashcards").fetchone()[0]
+        columns = {row[1] for row in source.execute("PRAGMA table_info(flashcards)")}
+        has_blobs = "answer_blob" in columns
+        if has_blobs:
+            # A deck with long answers and images in its own blob store
+            source.create_function("blob_text", 2, blobs.blob_text, deterministic=True)
+            cursor = source.execute(f"SELECT question, {blobs.SQL_ANSWER_TEXT.format('flashcards')} FROM flashcards")
+        else:
+            cursor = source.execute("SELECT question, answer FROM flashcards")
+        read = inserted = 0
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            if has_blobs:
+                rows = [(question, blobs.to_data_uris(source, answer)) for question, answer in rows]
+            inserted += store.add_unique_cards(rows, deck_id)
+            read += len(rows)
+            if progress is not None:
+                progress(read, total)
+    finally:
+        source.close()
+    return read, inserted
+
+
+class DictionaryImport:
+    """Outcome of ``import_dictionary_file``.
+
+    ``errors`` keeps the first ``MAX_REPORTED_ERRORS`` problems as
+    ``(row, message)`` pairs (row numbers are 1-based); ``error_count``
+    counts all of them.
+    """
+
+    def __init__(self):
+        self.read = 0
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+
+    @property
+    def duplicates(self):
+        return self.read - self.error_count - self.inserted
+
+    def add_error(self, row, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row, message))
+
+
+def iter_json_array(file, block_size=READ_BLOCK):
+    # Yields the items of a top-level JSON array read from a binary file,
+    # holding only the current block (plus one partial item) in memory.
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        block = file.read(block_size)
+        eof = not block
+        buffer = buffer[pos:] + utf8.decode(block, final=eof)
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if buffer[pos:pos + 1] != "[":
+        raise ValueError("Invalid dictionary file: expected a JSON array of cards.")
+    pos += 1
+    skip_whitespace()
+    if buffer[pos:pos + 1] == "]":
+        return
+    while True:
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+            # A value that runs up to the end of the buffer may be cut short
+            if end == len(buffer) and not eof:
+                raise json.JSONDecodeError("incomplete", buffer, end)
+        except json.JSONDecodeError as e:
+            if eof:
+                raise ValueError(f"Invalid JSON in dictionary file: {e.msg}") from None
+            fill()
+            continue
+        pos = end
+        yield item
+        skip_whitespace()
+        separator = buffer[pos:pos + 1]
+        pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError("Invalid JSON in dictionary file: expected ',' or ']' between cards.")
+        skip_whitespace()
+
+
+def iter_json_lines(file):
+    for line in file:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield e
+
+
+def validate_card(item):
+    if not isinstance(item, dict):
+        return "not an object with 'question' and 'answer'"
+    for key in ("question", "answer"):
+        value = item.get(key)
+        if not isinstance(value, str) or not value.strip():
+            return f"missing or empty '{key}'"
+    return None
+
+
+def import_dictionary_file(store, file_name, deck_id=DEFAULT_DECK, chunk_size=CHUNK_SIZE, progress=None):
+    """Import cards from a JSON array or JSON Lines file of {"question", "answer"} objects.
+
+    The file is parsed incrementally and valid cards are inserted
+    ``chunk_size`` at a time, one transaction per chunk, skipping questions
+    that are already in the deck. Invalid rows are reported in the result instead
+    of failing the import; only malformed JSON array syntax stops it.
+    ``progress`` receives bytes read and the file size.
+    """
+    result = DictionaryImport()
+    total = os.path.getsize(file_name)
+    with open(file_name, "rb") as file:
+        lines = file_name.lower().endswith(".jsonl")
+        items = iter_json_lines(file) if lines else iter_json_array(file)
+        chunk = []
+        for result.read, item in enumerate(items, 1):
+            error = f"invalid JSON: {item}" if isinstance(item, ValueError) else validate_card(item)
+            if error:
+                result.add_error(result.read, error)
+            else:
+                chunk.append((item["question"], item["answer"]))
+            if len(chunk) >= chunk_size:
+                result.inserted += store.add_unique_cards(chunk, deck_id)
+                chunk = []
+                if progress is not None:
+                    progress(file.tell(), total)
+        if chunk:
+            result.inserted += store.add_unique_cards(chunk, deck_id)
+    if progress is not None:
+        progress(total, total)
+    return result
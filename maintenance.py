@@ -0,0 +1,57 @@
+"""Background database upkeep, run by the window when the user is idle.
+
+Each step is short and leaves the database usable throughout: ``optimize``
+refreshes planner statistics within ``analysis_limit`` rows per index,
+``incremental_vacuum`` returns free pages a few megabytes at a time, a
+passive checkpoint copies the WAL back without waiting for readers, and
+the search index merges a bounded amount of its b-tree segments. ``cli.py
+vacuum`` is still the full, blocking rebuild.
+"""
+import time
+
+# Seconds between PRAGMA optimize runs
+OPTIMIZE_EVERY = 3600
+ANALYSIS_LIMIT = 1000
+# Free pages tolerated before they are handed back, and pages per run
+FREE_PAGES = 1024
+VACUUM_PAGES = 2048
+# FTS5 pages of segment merging per run
+SEARCH_MERGE_PAGES = 200
+AUTO_VACUUM_INCREMENTAL = 2
+
+SQL_MERGE_SEARCH = "INSERT INTO flashcards_fts (flashcards_fts, rank) VALUES ('merge', ?)"
+
+
+def run(store, now=None, force=False):
+    """Run the maintenance steps that are due; returns the names of those done.
+
+    ``force`` runs every step regardless of when it last ran or how much
+    there is to do.
+    """
+    now = int(time.time()) if now is None else now
+    conn = store.connection
+    done = []
+
+    last_optimized = int(store.meta("maintenance_optimized_at", 0))
+    if force or now - last_optimized >= OPTIMIZE_EVERY:
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        conn.execute("PRAGMA optimize")
+        store.set_meta("maintenance_optimized_at", now)
+        done.append("optimize")
+
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if free_pages > (0 if force else FREE_PAGES):
+            # executescript steps the pragma to completion; execute() frees a single page
+            conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+            done.append("incremental_vacuum")
+
+    with store.transaction() as conn:
+        conn.execute(SQL_MERGE_SEARCH, (SEARCH_MERGE_PAGES,))
+    done.append("merge_search")
+
+    # PASSIVE rather than TRUNCATE: it never waits on readers or the writer
+    busy, _, _ = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    if not busy:
+        done.append("checkpoint")
+    return done
@@ -0,0 +1,416 @@
+"""Versioned schema migrations, tracked with ``PRAGMA user_version``.
+
+``migrate`` runs, in order, every migration newer than the database. Each
+one is safe to run again: schema statements use IF NOT EXISTS, and data
+changes go through ``in_ranges`` in short keyed chunks, one transaction
+each, so readers, the review log and other processes keep going while a
+large deck is upgraded. Derived data (the search index, the summary
+tables) gets its triggers first and is then filled by idempotent chunks.
+A version is only recorded once its migration has finished, so an
+interrupted upgrade simply resumes on the next open.
+
+Version 1 is the schema as it stood before versioning and also upgrades
+any older, unversioned database in place. New migrations go at the end.
+"""
+from blobs import SQL_ANSWER_TEXT
+import scheduler
+
+# Rows per backfill transaction
+BACKFILL_CHUNK = 20000
+SQL_NEW_GUID = "lower(hex(randomblob(16)))"
+
+CREATE_FLASHCARDS = """
+    CREATE TABLE IF NOT EXISTS flashcards (
+        id INTEGER PRIMARY KEY,
+        question TEXT NOT NULL,
+        answer TEXT NOT NULL,
+        correct INTEGER DEFAULT 0,
+        wrong INTEGER DEFAULT 0,
+        question_hash INTEGER,
+        due INTEGER NOT NULL DEFAULT 0,
+        interval_days REAL NOT NULL DEFAULT 0,
+        ease REAL NOT NULL DEFAULT 2.5,
+        reps INTEGER NOT NULL DEFAULT 0,
+        lapses INTEGER NOT NULL DEFAULT 0,
+        answer_html TEXT,
+        deck_id INTEGER NOT NULL DEFAULT 1,
+        guid TEXT,
+        mtime INTEGER NOT NULL DEFAULT 0,
+        usn INTEGER NOT NULL DEFAULT -1,
+        answer_blob INTEGER
+    )
+"""
+# Append-only history of every answer given
+CREATE_REVIEWS = """
+    CREATE TABLE IF NOT EXISTS reviews (
+        id INTEGER PRIMARY KEY,
+        card_id INTEGER NOT NULL,
+        reviewed_at INTEGER NOT NULL,
+        grade INTEGER NOT NULL,
+        response_ms INTEGER,
+        guid TEXT,
+        usn INTEGER NOT NULL DEFAULT -1
+    )
+"""
+# Columns added after the first release and before versioning, in the order
+# they were introduced; older databases get them through ALTER TABLE.
+ADDED_COLUMNS = (
+    ("flashcards", "question_hash", "INTEGER"),
+    ("flashcards", "due", "INTEGER NOT NULL DEFAULT 0"),
+    ("flashcards", "interval_days", "REAL NOT NULL DEFAULT 0"),
+    ("flashcards", "ease", "REAL NOT NULL DEFAULT 2.5"),
+    ("flashcards", "reps", "INTEGER NOT NULL DEFAULT 0"),
+    ("flashcards", "lapses", "INTEGER NOT NULL DEFAULT 0"),
+    ("flashcards", "answer_html", "TEXT"),
+    ("flashcards", "deck_id", "INTEGER NOT NULL DEFAULT 1"),
+    ("flashcards", "guid", "TEXT"),
+    ("flashcards", "mtime", "INTEGER NOT NULL DEFAULT 0"),
+    ("flashcards", "usn", "INTEGER NOT NULL DEFAULT -1"),
+    ("reviews", "guid", "TEXT"),
+    ("reviews", "usn", "INTEGER NOT NULL DEFAULT -1"),
+    ("flashcards", "answer_blob", "INTEGER"),
+)
+# Every card belongs to one deck (the seeded "Default" deck unless chosen)
+# and to any number of tags through card_tags, which is keyed tag-first so
+# "cards with this tag" is a range scan.
+CREATE_DECKS = (
+    "CREATE TABLE IF NOT EXISTS decks (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)",
+    "INSERT OR IGNORE INTO decks (id, name) VALUES (1, 'Default')",
+    "CREATE TABLE IF NOT EXISTS tags (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)",
+    """CREATE TABLE IF NOT EXISTS card_tags (
+        tag_id INTEGER NOT NULL REFERENCES tags (id) ON DELETE CASCADE,
+        card_id INTEGER NOT NULL REFERENCES flashcards (id) ON DELETE CASCADE,
+        PRIMARY KEY (tag_id, card_id)
+    ) WITHOUT ROWID""",
+)
+CREATE_INDEXES = (
+    # Duplicate checks are per deck; this replaced the hash-only index
+    "DROP INDEX IF EXISTS flashcards_question_hash",
+    "CREATE INDEX IF NOT EXISTS flashcards_question_deck ON flashcards (question_hash, deck_id)",
+    "CREATE INDEX IF NOT EXISTS flashcards_due ON flashcards (due)",
+    "CREATE INDEX IF NOT EXISTS flashcards_wrong ON flashcards (wrong)",
+    "CREATE INDEX IF NOT EXISTS flashcards_deck_due ON flashcards (deck_id, due)",
+    "CREATE INDEX IF NOT EXISTS flashcards_deck_wrong ON flashcards (deck_id, wrong)",
+    "CREATE INDEX IF NOT EXISTS card_tags_card ON card_tags (card_id)",
+    "CREATE INDEX IF NOT EXISTS reviews_card ON reviews (card_id, reviewed_at)",
+    "CREATE INDEX IF NOT EXISTS reviews_time ON reviews (reviewed_at)",
+)
+
+# Summary tables kept up to date by triggers as reviews are appended, so
+# statistics read a row per day or per card instead of the whole history.
+# Days are UTC days since the epoch.
+CREATE_STATS = (
+    """CREATE TABLE IF NOT EXISTS review_daily (
+        day INTEGER PRIMARY KEY,
+        reviews INTEGER NOT NULL,
+        passed INTEGER NOT NULL,
+        response_ms INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS card_review_stats (
+        card_id INTEGER PRIMARY KEY,
+        reviews INTEGER NOT NULL,
+        failures INTEGER NOT NULL,
+        last_reviewed INTEGER NOT NULL
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS reviews_stats_insert AFTER INSERT ON reviews BEGIN
+        INSERT INTO review_daily (day, reviews, passed, response_ms)
+        VALUES (new.reviewed_at / {scheduler.DAY}, 1, new.grade >= {scheduler.PASSING_GRADE},
+                COALESCE(new.response_ms, 0))
+        ON CONFLICT (day) DO UPDATE SET reviews = reviews + 1, passed = passed + excluded.passed,
+                                        response_ms = response_ms + excluded.response_ms;
+        INSERT INTO card_review_stats (card_id, reviews, failures, last_reviewed)
+        VALUES (new.card_id, 1, new.grade < {scheduler.PASSING_GRADE}, new.reviewed_at)
+        ON CONFLICT (card_id) DO UPDATE SET reviews = reviews + 1, failures = failures + excluded.failures,
+                                            last_reviewed = MAX(last_reviewed, excluded.last_reviewed);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS flashcards_stats_delete AFTER DELETE ON flashcards BEGIN
+        DELETE FROM card_review_stats WHERE card_id = old.id;
+    END""",
+)
+# Recompute the summary rows of the days (and of the cards) in (?1, ?2]
+# from the review history. Each range is replaced whole, so filling after
+# the triggers exist is safe to repeat and to interleave with new reviews.
+SQL_FILL_REVIEW_DAILY = f"""
+    INSERT OR REPLACE INTO review_daily (day, reviews, passed, response_ms)
+    SELECT reviewed_at / {scheduler.DAY}, COUNT(*), SUM(grade >= {scheduler.PASSING_GRADE}),
+           SUM(COALESCE(response_ms, 0))
+    FROM reviews WHERE reviewed_at >= (?1 + 1) * {scheduler.DAY} AND reviewed_at < (?2 + 1) * {scheduler.DAY}
+    GROUP BY reviewed_at / {scheduler.DAY}"""
+SQL_FILL_CARD_STATS = f"""
+    INSERT OR REPLACE INTO card_review_stats (card_id, reviews, failures, last_reviewed)
+    SELECT f.id, COUNT(*), SUM(r.grade < {scheduler.PASSING_GRADE}), MAX(r.reviewed_at)
+    FROM flashcards f JOIN reviews r ON r.card_id = f.id WHERE f.id > ?1 AND f.id <= ?2
+    GROUP BY f.id"""
+# Days of review history per fill transaction
+STATS_FILL_DAYS = 30
+
+# The wrong-answers list pages through the wrong cards in the order of any
+# of its columns, with or without a deck; these partial indexes (over the
+# wrong cards only) serve each ordering, so no page sorts the whole set.
+# They also answer every other "wrong > 0" filter, which makes the
+# full-table wrong indexes redundant.
+CREATE_WRONG_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS flashcards_wrong_lapses ON flashcards (lapses) WHERE wrong > 0",
+    "CREATE INDEX IF NOT EXISTS flashcards_wrong_question ON flashcards (question) WHERE wrong > 0",
+    "CREATE INDEX IF NOT EXISTS flashcards_wrong_deck ON flashcards (deck_id) WHERE wrong > 0",
+    "CREATE INDEX IF NOT EXISTS flashcards_wrong_deck_lapses ON flashcards (deck_id, lapses) WHERE wrong > 0",
+    "CREATE INDEX IF NOT EXISTS flashcards_wrong_deck_question ON flashcards (deck_id, question) WHERE wrong > 0",
+    "DROP INDEX IF EXISTS flashcards_wrong",
+    "DROP INDEX IF EXISTS flashcards_deck_wrong",
+)
+
+# Card totals for the dashboards, kept by triggers per bucket of
+# 2**COUNT_BUCKET_BITS card ids so that a summary sums a few dozen rows
+# instead of scanning the deck, and so the table can be filled a bucket
+# at a time. Counts that depend on the time (due cards) come from indexes.
+COUNT_BUCKET_BITS = 16
+IS_NEW = "({0}.reps = 0 AND {0}.lapses = 0)"
+IS_WRONG = "(coalesce({0}.wrong, 0) > 0)"
+CREATE_CARD_COUNTS = (
+    """CREATE TABLE IF NOT EXISTS card_counts (
+        bucket INTEGER PRIMARY KEY,
+        cards INTEGER NOT NULL,
+        new INTEGER NOT NULL,
+        wrong INTEGER NOT NULL
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS flashcards_counts_insert AFTER INSERT ON flashcards BEGIN
+        INSERT INTO card_counts (bucket, cards, new, wrong)
+        VALUES (new.id >> {COUNT_BUCKET_BITS}, 1, {IS_NEW.format("new")}, {IS_WRONG.format("new")})
+        ON CONFLICT (bucket) DO UPDATE SET cards = cards + 1, new = new + excluded.new,
+                                           wrong = wrong + excluded.wrong;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS flashcards_counts_delete AFTER DELETE ON flashcards BEGIN
+        UPDATE card_counts SET cards = cards - 1, new = new - {IS_NEW.format("old")},
+                               wrong = wrong - {IS_WRONG.format("old")}
+        WHERE bucket = old.id >> {COUNT_BUCKET_BITS};
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS flashcards_counts_update AFTER UPDATE OF reps, lapses, wrong ON flashcards
+    WHEN {IS_NEW.format("new")} != {IS_NEW.format("old")} OR {IS_WRONG.format("new")} != {IS_WRONG.format("old")}
+    BEGIN
+        UPDATE card_counts SET new = new + {IS_NEW.format("new")} - {IS_NEW.format("old")},
+                               wrong = wrong + {IS_WRONG.format("new")} - {IS_WRONG.format("old")}
+        WHERE bucket = new.id >> {COUNT_BUCKET_BITS};
+    END""",
+)
+# Recount the buckets of the cards in (?1, ?2]; like the review summaries,
+# a whole bucket is replaced, so the fill can follow the triggers
+SQL_FILL_CARD_COUNTS = f"""
+    INSERT OR REPLACE INTO card_counts (bucket, cards, new, wrong)
+    SELECT id >> {COUNT_BUCKET_BITS}, COUNT(*), SUM({IS_NEW.format("flashcards")}),
+           SUM({IS_WRONG.format("flashcards")})
+    FROM flashcards WHERE id > ?1 AND id <= ?2 GROUP BY id >> {COUNT_BUCKET_BITS}"""
+
+# Long answers and embedded images (see blobs.py). Blobs are only ever
+# added; the ones no card refers to any more are dropped by
+# CardStore.vacuum().
+CREATE_BLOBS = (
+    """CREATE TABLE IF NOT EXISTS blobs (
+        id INTEGER PRIMARY KEY,
+        hash BLOB NOT NULL UNIQUE,
+        mime TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        codec TEXT NOT NULL,
+        data BLOB NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS flashcards_answer_blob ON flashcards (answer_blob) WHERE answer_blob IS NOT NULL",
+)
+
+# Full-text index over questions and answers. It is an external-content
+# table: the text lives only in flashcards and the triggers keep the index
+# in step with inserts, edits and deletes (grading does not touch it). Long
+# answers are indexed in full from their blob, while snippets are cut from
+# the preview kept in the row. A card is in the index when it has a row in
+# flashcards_fts_docsize; the triggers only remove cards that are, so the
+# index can be filled in chunks after they exist.
+ANSWER_TEXT_NEW = SQL_ANSWER_TEXT.format("new")
+ANSWER_TEXT_OLD = SQL_ANSWER_TEXT.format("old")
+INDEXED_OLD = "WHERE EXISTS (SELECT 1 FROM flashcards_fts_docsize WHERE id = old.id)"
+CREATE_SEARCH = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS flashcards_fts USING fts5("
+    "question, answer, content='flashcards', content_rowid='id')",
+    # Replaced by the flashcards_search_* triggers, which read answer blobs
+    "DROP TRIGGER IF EXISTS flashcards_fts_insert",
+    "DROP TRIGGER IF EXISTS flashcards_fts_delete",
+    "DROP TRIGGER IF EXISTS flashcards_fts_update",
+    f"""CREATE TRIGGER IF NOT EXISTS flashcards_search_insert AFTER INSERT ON flashcards BEGIN
+        INSERT INTO flashcards_fts (rowid, question, answer) VALUES (new.id, new.question, {ANSWER_TEXT_NEW});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS flashcards_search_delete AFTER DELETE ON flashcards BEGIN
+        INSERT INTO flashcards_fts (flashcards_fts, rowid, question, answer)
+        SELECT 'delete', old.id, old.question, {ANSWER_TEXT_OLD} {INDEXED_OLD};
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS flashcards_search_update
+    AFTER UPDATE OF question, answer, answer_blob ON flashcards BEGIN
+        INSERT INTO flashcards_fts (flashcards_fts, rowid, question, answer)
+        SELECT 'delete', old.id, old.question, {ANSWER_TEXT_OLD} {INDEXED_OLD};
+        INSERT INTO flashcards_fts (rowid, question, answer) VALUES (new.id, new.question, {ANSWER_TEXT_NEW});
+    END""",
+)
+
+# Change tracking for sync. Cards and reviews carry a random guid shared by
+# every copy of the database and an update sequence number: PENDING_USN
+# until the change has been sent to the sync server, then the server's
+# number for it. Local edits of a card (its tags included) reset usn and
+# stamp mtime, which decides last-writer-wins conflicts; sync writes set usn
+# themselves, so the triggers leave them alone. Deleted cards leave a
+# tombstone in sync_graves.
+PENDING_USN = -1
+SQL_NOW_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+SYNCED_CARD_COLUMNS = "question, answer, correct, wrong, due, interval_days, ease, reps, lapses, deck_id"
+CREATE_SYNC = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS flashcards_guid ON flashcards (guid)",
+    "CREATE INDEX IF NOT EXISTS flashcards_usn ON flashcards (usn)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS reviews_guid ON reviews (guid)",
+    "CREATE INDEX IF NOT EXISTS reviews_usn ON reviews (usn)",
+    """CREATE TABLE IF NOT EXISTS sync_graves (
+        guid TEXT PRIMARY KEY,
+        mtime INTEGER NOT NULL,
+        usn INTEGER NOT NULL DEFAULT -1
+    )""",
+    "CREATE INDEX IF NOT EXISTS sync_graves_usn ON sync_graves (usn)",
+    "CREATE TABLE IF NOT EXISTS sync_meta (key TEXT PRIMARY KEY, value)",
+    f"""CREATE TRIGGER IF NOT EXISTS flashcards_sync_update
+    AFTER UPDATE OF {SYNCED_CARD_COLUMNS} ON flashcards WHEN new.usn = old.usn BEGIN
+        UPDATE flashcards SET usn = {PENDING_USN}, mtime = {SQL_NOW_MS} WHERE id = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS card_tags_sync_insert AFTER INSERT ON card_tags BEGIN
+        UPDATE flashcards SET usn = {PENDING_USN}, mtime = {SQL_NOW_MS} WHERE id = new.card_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS card_tags_sync_delete AFTER DELETE ON card_tags BEGIN
+        UPDATE flashcards SET usn = {PENDING_USN}, mtime = {SQL_NOW_MS} WHERE id = old.card_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS flashcards_sync_delete AFTER DELETE ON flashcards WHEN old.guid IS NOT NULL BEGIN
+        INSERT OR REPLACE INTO sync_graves (guid, mtime, usn) VALUES (old.guid, {SQL_NOW_MS}, {PENDING_USN});
+    END""",
+)
+# Index the cards in (?1, ?2] that are not in the search index yet
+SQL_FILL_SEARCH = f"""
+    INSERT INTO flashcards_fts (rowid, question, answer)
+    SELECT id, question, {SQL_ANSWER_TEXT.format('flashcards')} FROM flashcards
+    WHERE id > ?1 AND id <= ?2 AND id NOT IN (SELECT id FROM flashcards_fts_docsize WHERE id > ?1 AND id <= ?2)"""
+
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+
+def schema_version(store):
+    return store.execute("PRAGMA user_version").fetchone()[0]
+
+
+def latest_version():
+    return MIGRATIONS[-1][0]
+
+
+def migrate(store):
+    """Bring the database up to the latest version; returns the versions applied."""
+    current = schema_version(store)
+    if current > latest_version():
+        raise RuntimeError(f"{store.path} has schema version {current}, newer than this program knows "
+                           f"({latest_version()}); please upgrade Open Flashcards")
+    applied = []
+    for version, _, fn in MIGRATIONS:
+        if version > current:
+            fn(store)
+            store.execute(f"PRAGMA user_version = {version}")
+            applied.append(version)
+    return applied
+
+
+def add_column(conn, table, name, definition):
+    # ALTER TABLE ... ADD COLUMN unless the column is already there; returns whether it was added
+    if name in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+    return True
+
+
+def in_ranges(store, sql, first, last, chunk_size=BACKFILL_CHUNK):
+    """Run ``sql`` for each range (start, end] from ``first`` to ``last``.
+
+    Each range is its own transaction, so the write lock is only held for
+    one chunk. Returns the total number of rows changed.
+    """
+    changed = 0
+    for start in range(first, last, chunk_size):
+        with store.transaction() as conn:
+            changed += conn.execute(sql, (start, start + chunk_size)).rowcount
+    return changed
+
+
+def max_rowid(store, table):
+    return store.execute(f"SELECT max(rowid) FROM {table}").fetchone()[0] or 0
+
+
+def backfill(store, table, assignment, condition, chunk_size=BACKFILL_CHUNK):
+    # UPDATE table SET assignment WHERE condition, a rowid range at a time. Rows
+    # added meanwhile are written by the current code and need no backfill.
+    sql = f"UPDATE {table} SET {assignment} WHERE rowid > ?1 AND rowid <= ?2 AND ({condition})"
+    return in_ranges(store, sql, 0, max_rowid(store, table), chunk_size)
+
+
+def fill_search_index(store):
+    return in_ranges(store, SQL_FILL_SEARCH, 0, max_rowid(store, "flashcards"))
+
+
+def fill_stats(store):
+    first, last = store.execute(f"SELECT min(reviewed_at) / {scheduler.DAY}, max(reviewed_at) / {scheduler.DAY} "
+                                "FROM reviews").fetchone()
+    if first is not None:
+        in_ranges(store, SQL_FILL_REVIEW_DAILY, first - 1, last, STATS_FILL_DAYS)
+    in_ranges(store, SQL_FILL_CARD_STATS, 0, max_rowid(store, "flashcards"))
+
+
+def _run_each(store, statements):
+    # One short transaction per statement, e.g. to build indexes one at a time
+    for statement in statements:
+        with store.transaction() as conn:
+            conn.execute(statement)
+
+
+@migration(1, "the schema as it was before versioning")
+def baseline(store):
+    with store.transaction() as conn:
+        conn.execute(CREATE_FLASHCARDS)
+        conn.execute(CREATE_REVIEWS)
+        for table, name, definition in ADDED_COLUMNS:
+            add_column(conn, table, name, definition)
+        for statement in CREATE_DECKS:
+            conn.execute(statement)
+    backfill(store, "flashcards", "question_hash = question_hash(question)", "question_hash IS NULL")
+    backfill(store, "flashcards", f"guid = {SQL_NEW_GUID}", "guid IS NULL")
+    backfill(store, "reviews", f"guid = {SQL_NEW_GUID}", "guid IS NULL")
+    # Indexes after the backfills, which then do not have to maintain them
+    _run_each(store, CREATE_INDEXES + CREATE_BLOBS + CREATE_SYNC)
+    # Triggers first, so the chunked fills only have to catch up on the rows
+    # that were there before them
+    with store.transaction() as conn:
+        for statement in CREATE_SEARCH + CREATE_STATS:
+            conn.execute(statement)
+    fill_search_index(store)
+    fill_stats(store)
+
+
+@migration(2, "long answers and inline images into the blob store")
+def pack_answers(store):
+    store.pack_answers()
+
+
+@migration(3, "card totals kept by triggers")
+def card_counts(store):
+    with store.transaction() as conn:
+        for statement in CREATE_CARD_COUNTS:
+            conn.execute(statement)
+    # Ranges aligned to whole buckets
+    in_ranges(store, SQL_FILL_CARD_COUNTS, -1, max_rowid(store, "flashcards"), 1 << COUNT_BUCKET_BITS)
+
+
+@migration(4, "indexes for every ordering of the wrong-answers list")
+def wrong_indexes(store):
+    _run_each(store, CREATE_WRONG_INDEXES)
@@ -0,0 +1,80 @@
+import time
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+PAGE_SIZE = 200
+
+
+class CardTableModel(QAbstractTableModel):
+    """Read-only card list that pages rows in from SQL as the view scrolls.
+
+    ``fetch_page(sort, descending, after, limit)`` returns rows of
+    ``(id, question, lapses, due, sort_value)``; ``after`` is the
+    ``(sort_value, id)`` of the last loaded row, so each page is a keyset
+    query rather than an ever-growing OFFSET.
+    """
+
+    COLUMNS = (("ID", "id"), ("Question", "question"), ("Lapses", "lapses"), ("Due", "due"))
+
+    def __init__(self, fetch_page, page_size=PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.rows = []
+        self.sort_key = "id"
+        self.descending = False
+        self.exhausted = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section][0]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == Qt.UserRole:
+            return row[0]
+        if role == Qt.DisplayRole:
+            value = row[index.column()]
+            if index.column() == 3:
+                return time.strftime("%Y-%m-%d", time.localtime(value)) if value else "new"
+            return value
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        after = (self.rows[-1][4], self.rows[-1][0]) if self.rows else None
+        page = self.fetch_page(self.sort_key, self.descending, after, self.page_size)
+        if len(page) < self.page_size:
+            self.exhausted = True
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_key = self.COLUMNS[column][1]
+        self.descending = order == Qt.DescendingOrder
+        self.refresh()
+
+    def refresh(self):
+        self.beginResetModel()
+        self.rows = []
+        self.exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def card_id(self, row):
+        return self.rows[row][0]
@@ -0,0 +1,177 @@
+"""Opt-in timing spans, counters and slow-query logging.
+
+Everything is off until ``PROFILER.enable()`` is called (``cli.py --trace``
+/ ``--profile`` do this); disabled spans are a shared no-op object, so the
+instrumented hot paths cost one attribute check. Recorded spans can be
+written as a Chrome trace (chrome://tracing, Perfetto) or as a JSON summary.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+log = logging.getLogger("flashcards.profile")
+
+MAX_EVENTS = 200000
+# Statements running longer than this are logged with their SQL
+SLOW_QUERY_MS = 50
+# SQLite virtual machine steps between progress callbacks
+PROGRESS_STEPS = 10000
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "category", "args", "start")
+
+    def __init__(self, profiler, name, category, args):
+        self.profiler = profiler
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add_span(self.name, self.category, self.start, time.perf_counter_ns() - self.start, self.args)
+        return False
+
+
+class Profiler:
+    """Collects spans and counters from any thread.
+
+    Spans are kept in a bounded buffer (the oldest are dropped after
+    ``MAX_EVENTS``). ``take_frame()`` returns the per-category time spent
+    since its previous call, which is what the debug overlay shows.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_query_ms = SLOW_QUERY_MS
+        self.events = deque(maxlen=MAX_EVENTS)
+        self.counters = defaultdict(int)
+        self.slow_queries = deque(maxlen=1000)
+        self._frame = defaultdict(lambda: [0, 0])
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = time.perf_counter_ns()
+
+    def enable(self, slow_query_ms=SLOW_QUERY_MS):
+        self.slow_query_ms = slow_query_ms
+        self.enabled = True
+
+    def span(self, name, category="app", **args):
+        return _Span(self, name, category, args) if self.enabled else NO_SPAN
+
+    def traced(self, name, category="app"):
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Span(self, name, category, {}):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += amount
+
+    def add_span(self, name, category, start_ns, duration_ns, args=None):
+        with self._lock:
+            self.events.append((name, category, start_ns, duration_ns, threading.get_ident(), args))
+            frame = self._frame[category]
+            frame[0] += duration_ns
+            frame[1] += 1
+
+    def take_frame(self):
+        # {category: (milliseconds, spans)} since the previous call
+        with self._lock:
+            frame, self._frame = self._frame, defaultdict(lambda: [0, 0])
+        return {category: (total / 1e6, spans) for category, (total, spans) in frame.items()}
+
+    def install(self, conn):
+        # SQLite hooks for one connection: the trace callback notes which
+        # statement is running and the progress handler reports it once it
+        # has run longer than slow_query_ms (for a cursor read in chunks
+        # that includes the time between fetches).
+        if not self.enabled:
+            return
+        conn.set_trace_callback(self._trace)
+        conn.set_progress_handler(self._progress, PROGRESS_STEPS)
+
+    def _trace(self, sql):
+        self.count("sqlite.statements")
+        self._local.statement = (sql, time.perf_counter_ns(), False)
+
+    def _progress(self, *_):
+        statement = getattr(self._local, "statement", None)
+        if statement is not None and not statement[2]:
+            sql, started, _ = statement
+            elapsed_ms = (time.perf_counter_ns() - started) / 1e6
+            if elapsed_ms >= self.slow_query_ms:
+                self._local.statement = (sql, started, True)
+                self.count("sqlite.slow_statements")
+                with self._lock:
+                    self.slow_queries.append({"sql": sql, "ms": elapsed_ms, "thread": threading.get_ident()})
+                log.warning("slow query (%.0f ms so far): %s", elapsed_ms, sql)
+        return 0
+
+    def summary(self):
+        by_name = defaultdict(list)
+        with self._lock:
+            for name, category, _, duration, _, _ in self.events:
+                by_name[(category, name)].append(duration / 1e6)
+            counters = dict(self.counters)
+            slow_queries = list(self.slow_queries)
+        spans = {}
+        for (category, name), durations in sorted(by_name.items()):
+            durations.sort()
+            spans[f"{category}:{name}"] = {
+                "count": len(durations), "total_ms": sum(durations), "mean_ms": sum(durations) / len(durations),
+                "p95_ms": durations[int(len(durations) * 0.95)], "max_ms": durations[-1],
+            }
+        return {"spans": spans, "counters": counters, "slow_queries": slow_queries}
+
+    def chrome_trace(self):
+        pid = os.getpid()
+        with self._lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+        trace = [{"name": name, "cat": category, "ph": "X", "pid": pid, "tid": tid,
+                  "ts": (start - self._origin) / 1000, "dur": duration / 1000, "args": args or {}}
+                 for name, category, start, duration, tid, args in events]
+        end = (time.perf_counter_ns() - self._origin) / 1000
+        trace.extend({"name": name, "ph": "C", "pid": pid, "ts": end, "args": {"value": value}}
+                     for name, value in counters.items())
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.chrome_trace(), file)
+
+    def write_summary(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.summary(), file, indent=2)
+
+
+PROFILER = Profiler()
+span = PROFILER.span
+traced = PROFILER.traced
+count = PROFILER.count
@@ -0,0 +1,103 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from blobs import BLOB_REF
+from profiling import PROFILER
+
+CACHE_SIZE = 256
+
+
+class AnswerRenderer:
+    """Markdown-to-HTML rendering for answers with an LRU cache and background prefetch.
+
+    Entries are keyed by card id and a hash of the answer text (or its blob,
+    for long answers), so an edited card never serves stale HTML. With
+    ``persist=True`` rendered HTML is also written to the ``answer_html``
+    column and reused across runs; ``CardStore.update_card`` clears it.
+    Cached HTML keeps ``blob:`` image references, which are pointed at the
+    files in the deck's media directory when an answer is shown.
+    """
+
+    def __init__(self, store, persist=False, cache_size=CACHE_SIZE):
+        self.store = store
+        self.persist = persist
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+
+    def _markdown(self):
+        # Markdown instances are reusable but not thread-safe, so keep one per thread
+        md = getattr(self._local, "markdown", None)
+        if md is None:
+            import markdown  # imported on first render to keep start-up light
+
+            md = self._local.markdown = markdown.Markdown()
+        return md
+
+    def _get(self, key):
+        with self._lock:
+            html = self._cache.get(key)
+            if html is not None:
+                self._cache.move_to_end(key)
+            return html
+
+    def _put(self, key, html):
+        with self._lock:
+            self._cache[key] = html
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def render_text(self, text):
+        PROFILER.count("render.markdown")
+        with PROFILER.span("markdown", "render"):
+            return self._markdown().reset().convert(text)
+
+    @staticmethod
+    def _key(card):
+        card_id, _, answer, answer_blob = card
+        return (card_id, hash(answer)) if answer_blob is None else (card_id, "blob", answer_blob)
+
+    def render(self, card):
+        key = self._key(card)
+        html = self._get(key)
+        if html is None:
+            PROFILER.count("render.cache_misses")
+            html = self.render_text(self.store.answer_text(card))
+            self._put(key, html)
+        else:
+            PROFILER.count("render.cache_hits")
+        return self.resolve_media(html)
+
+    def resolve_media(self, html):
+        if "blob:" not in html:
+            return html
+
+        def replace(match):
+            path = self.store.media_file(match.group(1))
+            return match.group(0) if path is None else Path(path).as_uri()
+        return BLOB_REF.sub(replace, html)
+
+    def prefetch(self, cards):
+        cards = [card for card in cards if self._get(self._key(card)) is None]
+        if cards:
+            self._executor.submit(self._render_batch, cards)
+
+    def _render_batch(self, cards):
+        stored = self.store.rendered_answers([card[0] for card in cards]) if self.persist else {}
+        rendered = []
+        for card in cards:
+            html = stored.get(card[0])
+            if html is None:
+                html = self.render_text(self.store.answer_text(card))
+                rendered.append((card[0], html))
+            self._put(self._key(card), html)
+        if self.persist and rendered:
+            self.store.save_rendered_answers(rendered)
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
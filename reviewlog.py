@@ -0,0 +1,67 @@
+import logging
+import threading
+import time
+
+log = logging.getLogger("flashcards.reviewlog")
+
+FLUSH_INTERVAL = 2.0
+
+
+class ReviewLog:
+    """Write-behind queue for review answers.
+
+    ``record`` only appends to an in-memory list; a background thread hands
+    the queued answers to ``CardStore.record_reviews`` every ``interval``
+    seconds, and ``flush`` can be called at any time (end of a session,
+    before reading schedules). Each flush is a single transaction, so a batch
+    is either fully applied or not at all; a failed flush puts the batch back
+    at the head of the queue. At most the last ``interval`` seconds of answers
+    can be lost if the process dies.
+    """
+
+    def __init__(self, store, interval=FLUSH_INTERVAL):
+        self.store = store
+        self.interval = interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="review-log", daemon=True)
+        self._thread.start()
+
+    def record(self, card_id, grade, response_ms=None, now=None):
+        reviewed_at = int(time.time()) if now is None else now
+        with self._lock:
+            self._pending.append((card_id, reviewed_at, grade, response_ms))
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        # Serialized so batches reach the database in the order they were recorded
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                self.store.record_reviews(batch)
+            except Exception:
+                with self._lock:
+                    self._pending[:0] = batch
+                raise
+            return len(batch)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                # Kept queued; retried on the next tick
+                log.exception("flushing %d review answers failed", self.pending())
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.flush()
@@ -0,0 +1,36 @@
+import time
+from collections import namedtuple
+
+# SM-2 quality grades used by the review buttons
+GRADE_AGAIN = 1
+GRADE_GOOD = 4
+PASSING_GRADE = 3
+
+DAY = 24 * 60 * 60
+RELEARN_DELAY = 10 * 60
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+CardSchedule = namedtuple("CardSchedule", "due interval_days ease reps lapses")
+
+
+def schedule(card, grade, now=None):
+    """Return the next ``CardSchedule`` for ``card`` after answering with ``grade`` (0-5).
+
+    Plain SM-2: passing answers grow the interval 1 day, 6 days, then by the
+    ease factor; failed answers reset the repetition count and bring the card
+    back after a short relearning delay.
+    """
+    now = int(time.time()) if now is None else now
+    ease = max(MIN_EASE, card.ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+
+    if grade < PASSING_GRADE:
+        return CardSchedule(now + RELEARN_DELAY, 0.0, ease, 0, card.lapses + 1)
+
+    if card.reps == 0:
+        interval_days = 1.0
+    elif card.reps == 1:
+        interval_days = 6.0
+    else:
+        interval_days = card.interval_days * ease
+    return CardSchedule(now + int(interval_days * DAY), interval_days, ease, card.reps + 1, card.lapses)
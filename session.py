@@ -0,0 +1,62 @@
+import random
+from array import array
+
+PREFETCH_WINDOW = 8
+
+
+class ReviewSession:
+    """Walks a list of card ids, keeping only a small window of full cards in memory.
+
+    Only the ids of the session are held up front (8 bytes each); question and
+    answer text is fetched ``window`` cards at a time as the session advances
+    and dropped once a card has been passed.
+    """
+
+    def __init__(self, store, card_ids, window=PREFETCH_WINDOW, shuffle=False, seed=None):
+        self.store = store
+        self.card_ids = array('q', card_ids)
+        if shuffle:
+            random.Random(seed).shuffle(self.card_ids)
+        self.window = window
+        self.index = 0
+        self._cards = {}
+        self._loaded_until = 0
+
+    def __len__(self):
+        return len(self.card_ids)
+
+    def __bool__(self):
+        return len(self.card_ids) > 0
+
+    def current(self):
+        # Cards deleted since the session started are skipped
+        while self.index < len(self.card_ids):
+            self._prefetch()
+            card = self._cards.get(self.card_ids[self.index])
+            if card is not None:
+                return card
+            self.index += 1
+        return None
+
+    def upcoming(self, count):
+        # Cards after the current one that are already in the window
+        ids = self.card_ids[self.index + 1:self.index + 1 + count]
+        return [self._cards[card_id] for card_id in ids if card_id in self._cards]
+
+    def advance(self):
+        if self.index < len(self.card_ids):
+            self._cards.pop(self.card_ids[self.index], None)
+            self.index += 1
+
+    def replace_current(self, card):
+        self._cards[card[0]] = card
+
+    def _prefetch(self):
+        # Top the window back up once it is half consumed
+        if self._loaded_until - self.index > self.window // 2 or self._loaded_until >= len(self.card_ids):
+            return
+        start = max(self.index, self._loaded_until)
+        end = min(len(self.card_ids), self.index + self.window)
+        for card in self.store.cards_by_ids(self.card_ids[start:end]):
+            self._cards[card[0]] = card
+        self._loaded_until = end
@@ -0,0 +1,111 @@
+import time
+from bisect import bisect_right
+
+import scheduler
+
+DAY = scheduler.DAY
+CHUNK_SIZE = 100000
+# Retention is grouped by days since the card's previous review
+RETENTION_BINS = (0, 1, 2, 4, 7, 14, 30, 60, 120, 365)
+
+try:
+    import numpy
+except ImportError:  # the pure-Python fallback gives the same numbers, just slower
+    numpy = None
+
+
+def _now(now):
+    return int(time.time()) if now is None else now
+
+
+def session_summary(store, since, now=None):
+    # Answers recorded from `since` onwards (served by the reviews_time index)
+    reviews, passed, response_ms = store.execute(
+        "SELECT COUNT(*), COALESCE(SUM(grade >= ?), 0), AVG(response_ms) FROM reviews "
+        "WHERE reviewed_at >= ? AND reviewed_at <= ?",
+        (scheduler.PASSING_GRADE, since, _now(now))).fetchone()
+    return {"reviews": reviews, "passed": passed, "avg_response_ms": response_ms}
+
+
+def daily_history(store, days=30, now=None):
+    # (day start, reviews, passed, average response ms) for each of the last `days` days
+    today = _now(now) // DAY
+    rows = dict((day, row) for day, *row in store.execute(
+        "SELECT day, reviews, passed, response_ms FROM review_daily WHERE day > ? ORDER BY day",
+        (today - days,)))
+    history = []
+    for day in range(today - days + 1, today + 1):
+        reviews, passed, response_ms = rows.get(day, (0, 0, 0))
+        history.append((day * DAY, reviews, passed, response_ms / reviews if reviews else None))
+    return history
+
+
+def forecast(store, days=30, now=None):
+    # Cards coming due on each of the next `days` days; overdue cards count for today
+    now = _now(now)
+    counts = [0] * days
+    for offset, count in store.execute(
+            "SELECT MAX(due - ?, 0) / ?, COUNT(*) FROM flashcards WHERE due < ? GROUP BY 1",
+            (now, DAY, now + days * DAY)):
+        counts[offset] += count
+    return counts
+
+
+def hardest_cards(store, limit=10, min_reviews=3):
+    # Highest failure rate among cards with enough answers, from the per-card summary table
+    return store.execute(
+        "SELECT s.card_id, substr(f.question, 1, 200), s.reviews, CAST(s.failures AS REAL) / s.reviews AS difficulty "
+        "FROM card_review_stats s JOIN flashcards f ON f.id = s.card_id "
+        "WHERE s.reviews >= ? ORDER BY difficulty DESC, s.reviews DESC LIMIT ?",
+        (min_reviews, limit)).fetchall()
+
+
+def _iter_elapsed(store, since):
+    # (days since previous review of the same card, passed) for reviews after `since`
+    cursor = store.execute(
+        f"SELECT (reviewed_at - previous) / {DAY}.0, grade >= ? FROM ("
+        "  SELECT reviewed_at, grade, LAG(reviewed_at) OVER (PARTITION BY card_id ORDER BY reviewed_at) AS previous"
+        "  FROM reviews WHERE reviewed_at >= ?"
+        ") WHERE previous IS NOT NULL",
+        (scheduler.PASSING_GRADE, since))
+    while True:
+        rows = cursor.fetchmany(CHUNK_SIZE)
+        if not rows:
+            return
+        yield rows
+
+
+def retention_curve(store, since_days=365, bins=RETENTION_BINS, now=None):
+    """Share of passing answers by time since the card was last seen.
+
+    Returns ``(lower bound in days, answers, retention)`` per bin, where
+    retention is None for empty bins. The review history is streamed in
+    chunks and binned with NumPy when it is installed.
+    """
+    since = _now(now) - since_days * DAY
+    totals = [0] * len(bins)
+    passes = [0] * len(bins)
+    for rows in _iter_elapsed(store, since):
+        if numpy is not None:
+            data = numpy.asarray(rows, dtype=float)
+            index = numpy.searchsorted(bins, data[:, 0], side="right") - 1
+            totals = numpy.add(totals, numpy.bincount(index, minlength=len(bins)))
+            passes = numpy.add(passes, numpy.bincount(index, weights=data[:, 1], minlength=len(bins)))
+        else:
+            for elapsed, passed in rows:
+                index = bisect_right(bins, elapsed) - 1
+                totals[index] += 1
+                passes[index] += passed
+    return [(bound, int(total), float(passed) / total if total else None)
+            for bound, total, passed in zip(bins, totals, passes)]
+
+
+def deck_report(store, now=None):
+    now = _now(now)
+    return {
+        "summary": store.summary(now),
+        "forecast": forecast(store, 14, now),
+        "history": daily_history(store, 14, now),
+        "retention": retention_curve(store, now=now),
+        "hardest": hardest_cards(store),
+    }
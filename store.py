@@ -0,0 +1,516 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import blobs
+import scheduler
+from migrations import PENDING_USN, SQL_NOW_MS, migrate
+from profiling import PROFILER
+
+DEFAULT_DB = "flashcards.db"
+DEFAULT_DECK = 1
+
+# Connection tuning: WAL lets readers run alongside a writer and, together with
+# synchronous=NORMAL, turns every commit into an append instead of an fsync.
+PRAGMAS = (
+    # Only takes effect before the first table is created; existing databases
+    # switch at their next vacuum()
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA foreign_keys = ON",
+    # Truncate the WAL after checkpoints instead of letting it keep its peak size
+    f"PRAGMA journal_size_limit = {64 * 1024 * 1024}",
+)
+CACHE_SIZE_KB = 64 * 1024
+MMAP_SIZE = 256 * 1024 * 1024
+STATEMENT_CACHE = 256
+
+# Keep every statement as a constant so the per-connection statement cache
+# always sees the same SQL text and reuses the prepared statement.
+SQL_INSERT_CARD_UNIQUE = (
+    "INSERT INTO flashcards (question, answer, question_hash, deck_id, answer_blob, guid, mtime) "
+    f"SELECT ?1, ?2, ?3, ?4, ?5, lower(hex(randomblob(16))), {SQL_NOW_MS} "
+    "WHERE NOT EXISTS (SELECT 1 FROM flashcards WHERE question_hash = ?3 AND deck_id = ?4)"
+)
+SQL_UPDATE_CARD = (
+    "UPDATE flashcards SET question = ?, answer = ?, answer_blob = ?, question_hash = ?, answer_html = NULL "
+    "WHERE id = ?"
+)
+SQL_INSERT_REVIEW = (
+    "INSERT INTO reviews (card_id, reviewed_at, grade, response_ms, guid) "
+    "VALUES (?, ?, ?, ?, lower(hex(randomblob(16))))"
+)
+SQL_SCHEDULE = "SELECT due, interval_days, ease, reps, lapses FROM flashcards WHERE id = ?"
+SQL_GRADE = (
+    "UPDATE flashcards SET correct = ?, wrong = ?, due = ?, interval_days = ?, ease = ?, reps = ?, lapses = ? "
+    "WHERE id = ?"
+)
+SQL_RESET_WRONG = "UPDATE flashcards SET wrong = 0 WHERE id IN (SELECT value FROM json_each(?))"
+SQL_CARD_IDS = "SELECT id FROM flashcards"
+SQL_CARD_ANSWER = "SELECT answer, answer_blob FROM flashcards WHERE id = ?"
+SQL_CARDS_BY_IDS = "SELECT id, question, answer, answer_blob FROM flashcards WHERE id IN ({})"
+SQL_RENDERED_BY_IDS = "SELECT id, answer_html FROM flashcards WHERE answer_html IS NOT NULL AND id IN ({})"
+SQL_SAVE_RENDERED = "UPDATE flashcards SET answer_html = ? WHERE id = ?"
+# Card list pages: short question, stats, then the sort value used as the keyset cursor
+SQL_CARD_PAGE = "SELECT id, substr(question, 1, 200), lapses, due, {0} FROM flashcards"
+LIST_SORT_COLUMNS = {"id": "id", "question": "question", "lapses": "lapses", "due": "due"}
+SQL_SEARCH = (
+    "SELECT rowid, snippet(flashcards_fts, 0, '[', ']', '…', 12), snippet(flashcards_fts, 1, '[', ']', '…', 12) "
+    "FROM flashcards_fts WHERE flashcards_fts MATCH ? ORDER BY rank LIMIT ? OFFSET ?"
+)
+SQL_SEARCH_COUNT = "SELECT COUNT(*) FROM flashcards_fts WHERE flashcards_fts MATCH ?"
+# Answers written before the blob store that belong in it, by id from ?1
+SQL_UNPACKED_ANSWERS = (
+    "SELECT id, answer FROM flashcards WHERE id > ?1 AND answer_blob IS NULL "
+    "AND (length(answer) > ?2 OR answer LIKE '%data:%') ORDER BY id LIMIT ?3"
+)
+SQL_PACK_ANSWER = "UPDATE flashcards SET answer = ?, answer_blob = ?, answer_html = NULL WHERE id = ?"
+SQL_MEDIA_ANSWERS = (
+    f"SELECT {blobs.SQL_ANSWER_TEXT.format('flashcards')} FROM flashcards "
+    "WHERE answer_blob IS NOT NULL OR answer LIKE '%blob:%'"
+)
+SQL_PRUNE_BLOBS = (
+    "DELETE FROM blobs WHERE id NOT IN (SELECT answer_blob FROM flashcards WHERE answer_blob IS NOT NULL) "
+    "AND hash NOT IN (SELECT hash FROM temp.live_media)"
+)
+SQL_DUPLICATE_GROUPS = (
+    "SELECT group_concat(id) FROM flashcards WHERE (deck_id, question_hash) IN "
+    "(SELECT deck_id, question_hash FROM flashcards GROUP BY deck_id, question_hash HAVING COUNT(*) > 1) "
+    "GROUP BY deck_id, question_hash"
+)
+# Fold the stats of duplicate cards ({0}) into the kept card: it stays wrong
+# if any copy was wrong, and takes the earliest due date and the most
+# cautious interval and ease.
+SQL_MERGE_STATS = """
+    UPDATE flashcards SET
+        correct = (SELECT MAX(correct) FROM flashcards WHERE id = ?1 OR id IN ({0})),
+        wrong = (SELECT MAX(wrong) FROM flashcards WHERE id = ?1 OR id IN ({0})),
+        due = (SELECT MIN(due) FROM flashcards WHERE id = ?1 OR id IN ({0})),
+        interval_days = (SELECT MIN(interval_days) FROM flashcards WHERE id = ?1 OR id IN ({0})),
+        ease = (SELECT MIN(ease) FROM flashcards WHERE id = ?1 OR id IN ({0})),
+        reps = (SELECT MAX(reps) FROM flashcards WHERE id = ?1 OR id IN ({0})),
+        lapses = (SELECT SUM(lapses) FROM flashcards WHERE id = ?1 OR id IN ({0}))
+    WHERE id = ?1
+"""
+SQL_MOVE_REVIEWS = f"UPDATE reviews SET card_id = ?1, usn = {PENDING_USN} WHERE card_id IN ({{0}})"
+SQL_MOVE_TAGS = "INSERT OR IGNORE INTO card_tags (tag_id, card_id) SELECT tag_id, ?1 FROM card_tags WHERE card_id IN ({0})"
+SQL_RECOUNT_CARD_STATS = (
+    "INSERT OR REPLACE INTO card_review_stats (card_id, reviews, failures, last_reviewed) "
+    f"SELECT card_id, COUNT(*), SUM(grade < {scheduler.PASSING_GRADE}), MAX(reviewed_at) "
+    "FROM reviews WHERE card_id = ? GROUP BY card_id"
+)
+SQL_DELETE_CARDS = "DELETE FROM flashcards WHERE id IN ({0})"
+SQL_CARD_COUNTS = "SELECT COALESCE(SUM(cards), 0), COALESCE(SUM(new), 0), COALESCE(SUM(wrong), 0) FROM card_counts"
+SQL_DUE_COUNT = "SELECT COUNT(*) FROM flashcards WHERE due <= ?"
+SQL_REVIEW_SUMMARY = (
+    "SELECT COALESCE(SUM(reviews), 0), CAST(SUM(passed) AS REAL) / SUM(reviews) FROM review_daily WHERE day >= ?"
+)
+SQL_COUNT_CARDS = "SELECT COUNT(*) FROM flashcards"
+SQL_DECKS = (
+    "SELECT d.id, d.name, (SELECT COUNT(*) FROM flashcards WHERE deck_id = d.id) FROM decks d ORDER BY d.name"
+)
+SQL_TAGS = (
+    "SELECT t.id, t.name, (SELECT COUNT(*) FROM card_tags WHERE tag_id = t.id) FROM tags t ORDER BY t.name"
+)
+SQL_DECK_ID = "SELECT id FROM decks WHERE name = ?"
+SQL_TAG_ID = "SELECT id FROM tags WHERE name = ?"
+SQL_INSERT_DECK = "INSERT INTO decks (name) VALUES (?)"
+SQL_INSERT_TAG = "INSERT INTO tags (name) VALUES (?)"
+SQL_TAG_CARDS = "INSERT OR IGNORE INTO card_tags (tag_id, card_id) SELECT ?1, value FROM json_each(?2)"
+SQL_CARD_TAGS = (
+    "SELECT t.name FROM card_tags c JOIN tags t ON t.id = c.tag_id WHERE c.card_id = ? ORDER BY t.name"
+)
+SQL_CLEAR_CARD_TAGS = "DELETE FROM card_tags WHERE card_id = ?"
+SQL_GET_META = "SELECT value FROM sync_meta WHERE key = ?"
+SQL_SET_META = "INSERT OR REPLACE INTO sync_meta (key, value) VALUES (?, ?)"
+
+EXPORT_COLUMNS = ("question", "answer")
+STATS_COLUMNS = ("correct", "wrong", "due", "interval_days", "ease", "reps", "lapses")
+
+
+def normalize_question(question):
+    return " ".join(question.split()).casefold()
+
+
+def question_hash(question):
+    # 64-bit digest of the normalized text, stored as a signed SQLite integer
+    digest = hashlib.blake2b(normalize_question(question).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def search_query(text):
+    # Turn free text into an FTS5 query: every word must match, the last one as a prefix
+    terms = ['"' + term.replace('"', '""') + '"' for term in text.split()]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+class CardStore:
+    """SQLite-backed card storage with no GUI dependencies.
+
+    Each thread gets its own tuned connection from a small pool, so the store
+    can be shared between the window, background workers and scripts.
+    Writes autocommit unless they run inside ``transaction()``.
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self.create_table()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.create_function("question_hash", 1, question_hash, deterministic=True)
+        conn.create_function("blob_text", 2, blobs.blob_text, deterministic=True)
+        PROFILER.install(conn)
+        return conn
+
+    @property
+    def connection(self):
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.connection = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def release_connection(self):
+        # Closes the calling thread's connection, for threads that may not run again
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            return
+        self._local.connection = None
+        with self._lock:
+            self._connections.remove(conn)
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    @contextmanager
+    def transaction(self):
+        # Nested calls join the outer transaction, so helpers can be batched.
+        conn = self.connection
+        if conn.in_transaction:
+            yield conn
+            return
+        with PROFILER.span("transaction", "db"):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                PROFILER.count("db.rollbacks")
+                raise
+            else:
+                conn.commit()
+                PROFILER.count("db.commits")
+
+    def execute(self, sql, params=()):
+        # Spans cover preparing the statement and stepping to its first row
+        if not PROFILER.enabled:
+            return self.connection.execute(sql, params)
+        with PROFILER.span("execute", "db", sql=sql):
+            return self.connection.execute(sql, params)
+
+    def create_table(self):
+        # Creates the schema or upgrades an older database (see migrations.py)
+        migrate(self)
+
+    def add_card(self, question, answer, deck_id=DEFAULT_DECK, tags=(), allow_files=False):
+        # Returns the new card id, or None when the deck already has the question.
+        # allow_files stores images given as local paths (see blobs.store_media).
+        with self.transaction() as conn:
+            answer, answer_blob = blobs.pack_answer(conn, answer, allow_files)
+            cursor = conn.execute(SQL_INSERT_CARD_UNIQUE, (question, answer, question_hash(question), deck_id,
+                                                           answer_blob))
+            if not cursor.rowcount:
+                return None
+            card_id = cursor.lastrowid
+            for name in tags:
+                self.tag_cards([card_id], name)
+        return card_id
+
+    def add_unique_cards(self, cards, deck_id=DEFAULT_DECK):
+        # Skips cards whose normalized question is already in the deck (or
+        # repeated earlier in ``cards``); returns the number of rows inserted.
+        seen = set()
+        rows = []
+        with self.transaction() as conn:
+            for question, answer in cards:
+                key = question_hash(question)
+                if key not in seen:
+                    seen.add(key)
+                    answer, answer_blob = blobs.pack_answer(conn, answer)
+                    rows.append((question, answer, key, deck_id, answer_blob))
+            return conn.executemany(SQL_INSERT_CARD_UNIQUE, rows).rowcount
+
+    def update_card(self, card_id, question, answer, allow_files=False):
+        # With allow_files only paths new in this edit are read: the stored
+        # answer may have come from sync or an import
+        with self.transaction() as conn:
+            keep = ()
+            if allow_files:
+                row = conn.execute(SQL_CARD_ANSWER, (card_id,)).fetchone()
+                if row is not None:
+                    keep = blobs.image_targets(self.answer_text((card_id, None, *row)))
+            conn.execute(SQL_UPDATE_CARD, (question, *blobs.pack_answer(conn, answer, allow_files, keep),
+                                           question_hash(question), card_id))
+
+    def answer_text(self, card):
+        # The full answer of a (id, question, answer, answer_blob) card; long
+        # answers are only read from their blob here, when they are shown
+        if card[3] is None:
+            return card[2]
+        blob = blobs.read(self.connection, card[3])
+        return card[2] if blob is None else blob[1].decode("utf-8")
+
+    def portable_text(self, text):
+        # Text with images inlined as data URIs, for exports and sync
+        return blobs.to_data_uris(self.connection, text)
+
+    @property
+    def media_dir(self):
+        return os.path.splitext(os.path.abspath(self.path))[0] + ".media"
+
+    def media_file(self, digest_hex):
+        # Path of an image blob written out for display, or None if unknown
+        path = os.path.join(self.media_dir, digest_hex)
+        if not os.path.exists(path):
+            blob = blobs.read_hash(self.connection, digest_hex)
+            if blob is None:
+                return None
+            os.makedirs(self.media_dir, exist_ok=True)
+            temp_path = f"{path}.{threading.get_ident()}.part"
+            with open(temp_path, "wb") as file:
+                file.write(blob[1])
+            os.replace(temp_path, path)
+        return path
+
+    def grade_card(self, card_id, grade, now=None):
+        # Reschedules the card and keeps the correct/wrong flags in step with the last answer
+        with self.transaction() as conn:
+            row = conn.execute(SQL_SCHEDULE, (card_id,)).fetchone()
+            if row is None:
+                return None
+            next_schedule = scheduler.schedule(scheduler.CardSchedule(*row), grade, now)
+            correct = grade >= scheduler.PASSING_GRADE
+            conn.execute(SQL_GRADE, (int(correct), int(not correct), *next_schedule, card_id))
+        return next_schedule
+
+    def record_reviews(self, reviews):
+        # reviews: (card_id, reviewed_at, grade, response_ms) tuples, applied in order
+        with self.transaction() as conn:
+            for card_id, reviewed_at, grade, _ in reviews:
+                self.grade_card(card_id, grade, reviewed_at)
+            conn.executemany(SQL_INSERT_REVIEW, reviews)
+
+    def duplicate_groups(self):
+        # Ids of cards sharing a normalized question, one sorted list per question
+        return [sorted(int(card_id) for card_id in ids.split(",")) for ids, in self.execute(SQL_DUPLICATE_GROUPS)]
+
+    def merge_cards(self, keep_id, duplicate_ids):
+        # Folds duplicates into keep_id: stats merged, review history moved, duplicates deleted
+        duplicate_ids = [card_id for card_id in duplicate_ids if card_id != keep_id]
+        if not duplicate_ids:
+            return
+        placeholders = ",".join(f"?{n}" for n in range(2, len(duplicate_ids) + 2))
+        params = [keep_id, *duplicate_ids]
+        with self.transaction() as conn:
+            conn.execute(SQL_MERGE_STATS.format(placeholders), params)
+            conn.execute(SQL_MOVE_REVIEWS.format(placeholders), params)
+            conn.execute(SQL_MOVE_TAGS.format(placeholders), params)
+            conn.execute(SQL_DELETE_CARDS.format(placeholders), params)
+            conn.execute(SQL_RECOUNT_CARD_STATS, (keep_id,))
+
+    def reset_wrong(self, card_ids):
+        # One statement for any number of ids, passed as a JSON array
+        self.execute(SQL_RESET_WRONG, (json.dumps(list(card_ids)),))
+
+    def due_card_ids(self, limit, now=None, deck_id=None, tag_id=None):
+        where, params = self._card_filter(due_only=True, now=now, deck_id=deck_id, tag_id=tag_id)
+        return [row[0] for row in self.execute(SQL_CARD_IDS + where + " ORDER BY due LIMIT ?", (*params, limit))]
+
+    def wrong_card_ids(self, deck_id=None, tag_id=None):
+        where, params = self._card_filter(wrong_only=True, deck_id=deck_id, tag_id=tag_id)
+        return [row[0] for row in self.execute(SQL_CARD_IDS + where, params)]
+
+    def cards_by_ids(self, card_ids):
+        card_ids = list(card_ids)
+        if not card_ids:
+            return []
+        return self.execute(SQL_CARDS_BY_IDS.format(",".join("?" * len(card_ids))), card_ids).fetchall()
+
+    def wrong_page(self, sort="id", descending=False, after=None, limit=200, deck_id=None, tag_id=None):
+        column = LIST_SORT_COLUMNS[sort]
+        operator, order = ("<", "DESC") if descending else (">", "ASC")
+        where, params = self._card_filter(wrong_only=True, deck_id=deck_id, tag_id=tag_id)
+        sql = SQL_CARD_PAGE.format(column) + where
+        if after is not None:
+            sql += f" AND ({column}, id) {operator} (?, ?)"
+            params.extend(after)
+        sql += f" ORDER BY {column} {order}, id {order} LIMIT ?"
+        params.append(limit)
+        return self.execute(sql, params).fetchall()
+
+    def rendered_answers(self, card_ids):
+        card_ids = list(card_ids)
+        if not card_ids:
+            return {}
+        return dict(self.execute(SQL_RENDERED_BY_IDS.format(",".join("?" * len(card_ids))), card_ids))
+
+    def save_rendered_answers(self, rendered):
+        with self.transaction() as conn:
+            conn.executemany(SQL_SAVE_RENDERED, ((html, card_id) for card_id, html in rendered))
+
+    def search(self, text, limit=50, offset=0):
+        # Ranked (id, question snippet, answer snippet) rows, best match first
+        query = search_query(text)
+        if not query:
+            return []
+        return self.execute(SQL_SEARCH, (query, limit, offset)).fetchall()
+
+    def search_count(self, text):
+        query = search_query(text)
+        if not query:
+            return 0
+        return self.execute(SQL_SEARCH_COUNT, (query,)).fetchone()[0]
+
+    def summary(self, now=None):
+        now = int(time.time()) if now is None else now
+        # Totals from the trigger-maintained card_counts, due cards from the due index
+        cards, new, wrong = self.execute(SQL_CARD_COUNTS).fetchone()
+        due = self.execute(SQL_DUE_COUNT, (now,)).fetchone()[0]
+        today = now // scheduler.DAY
+        reviews_today, _ = self.execute(SQL_REVIEW_SUMMARY, (today,)).fetchone()
+        reviews_month, retention = self.execute(SQL_REVIEW_SUMMARY, (today - 29,)).fetchone()
+        return {"cards": cards, "due": due, "new": new, "wrong": wrong, "reviews_today": reviews_today,
+                "reviews_30d": reviews_month, "retention_30d": retention}
+
+    def pack_answers(self, chunk_size=1000):
+        # Moves long answers and inline images of older cards into blobs, a chunk per transaction
+        after = packed = 0
+        while True:
+            with self.transaction() as conn:
+                rows = conn.execute(SQL_UNPACKED_ANSWERS, (after, blobs.ANSWER_BLOB_CHARS, chunk_size)).fetchall()
+                for card_id, answer in rows:
+                    packed_answer, answer_blob = blobs.pack_answer(conn, answer)
+                    if packed_answer != answer or answer_blob is not None:
+                        conn.execute(SQL_PACK_ANSWER, (packed_answer, answer_blob, card_id))
+                        packed += 1
+            if len(rows) < chunk_size:
+                return packed
+            after = rows[-1][0]
+
+    def prune_blobs(self):
+        # Deletes blobs no card refers to any more; returns how many
+        with self.transaction() as conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS live_media (hash BLOB PRIMARY KEY) WITHOUT ROWID")
+            conn.execute("DELETE FROM temp.live_media")
+            cursor = conn.execute(SQL_MEDIA_ANSWERS)
+            while rows := cursor.fetchmany(1000):
+                conn.executemany("INSERT OR IGNORE INTO temp.live_media VALUES (?)",
+                                 ((bytes.fromhex(digest),) for text, in rows for digest in blobs.media_refs(text)))
+            return conn.execute(SQL_PRUNE_BLOBS).rowcount
+
+    def vacuum(self):
+        # Prune blobs, rebuild the file and refresh planner statistics. In WAL
+        # mode the rebuilt pages land in the WAL, so checkpoint afterwards for
+        # the file itself to shrink.
+        self.prune_blobs()
+        conn = self.connection
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("PRAGMA optimize")
+
+    def decks(self):
+        # (id, name, card count) for every deck, by name
+        return self.execute(SQL_DECKS).fetchall()
+
+    def tags(self):
+        return self.execute(SQL_TAGS).fetchall()
+
+    def deck_id(self, name, create=False):
+        row = self.execute(SQL_DECK_ID, (name,)).fetchone()
+        if row is not None:
+            return row[0]
+        return self.execute(SQL_INSERT_DECK, (name,)).lastrowid if create else None
+
+    def tag_id(self, name, create=False):
+        row = self.execute(SQL_TAG_ID, (name,)).fetchone()
+        if row is not None:
+            return row[0]
+        return self.execute(SQL_INSERT_TAG, (name,)).lastrowid if create else None
+
+    def tag_cards(self, card_ids, name):
+        with self.transaction():
+            self.execute(SQL_TAG_CARDS, (self.tag_id(name, create=True), json.dumps(list(card_ids))))
+
+    def card_tags(self, card_id):
+        return [row[0] for row in self.execute(SQL_CARD_TAGS, (card_id,))]
+
+    def set_card_tags(self, card_id, names):
+        with self.transaction() as conn:
+            conn.execute(SQL_CLEAR_CARD_TAGS, (card_id,))
+            for name in names:
+                self.tag_cards([card_id], name)
+
+    def meta(self, key, default=None):
+        # Small settings kept with the deck, such as the sync position
+        row = self.execute(SQL_GET_META, (key,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_meta(self, key, value):
+        self.execute(SQL_SET_META, (key, value))
+
+    def _card_filter(self, wrong_only=False, due_only=False, now=None, deck_id=None, tag_id=None):
+        # WHERE clause shared by card lists, exports and counts. A deck is
+        # matched through the (deck_id, due) and wrong-card indexes and a tag
+        # drives rowid lookups from its card_tags range.
+        conditions, params = [], []
+        if deck_id is not None:
+            conditions.append("deck_id = ?")
+            params.append(deck_id)
+        if tag_id is not None:
+            conditions.append("id IN (SELECT card_id FROM card_tags WHERE tag_id = ?)")
+            params.append(tag_id)
+        if wrong_only:
+            conditions.append("wrong > 0")
+        if due_only:
+            conditions.append("due <= ?")
+            params.append(int(time.time()) if now is None else now)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def count_cards(self, **filters):
+        where, params = self._card_filter(**filters)
+        return self.execute(SQL_COUNT_CARDS + where, params).fetchone()[0]
+
+    def export_rows(self, columns=EXPORT_COLUMNS, **filters):
+        unknown = set(columns) - set(EXPORT_COLUMNS + STATS_COLUMNS + ("id",))
+        if unknown:
+            raise ValueError(f"Unknown export columns: {', '.join(sorted(unknown))}")
+        where, params = self._card_filter(**filters)
+        # Long answers come out of their blobs; images stay blob references (see portable_text)
+        selected = ", ".join(blobs.SQL_ANSWER_TEXT.format("flashcards") if column == "answer" else column
+                             for column in columns)
+        return self.execute(f"SELECT {selected} FROM flashcards{where} ORDER BY id", params)
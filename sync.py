@@ -0,0 +1,442 @@
+"""Delta sync between copies of a flashcards database.
+
+One database acts as the server (``cli.py sync-server``); every other copy
+syncs against it (``cli.py sync URL``) by pulling the rows the server
+changed since the copy's last sync and then pushing its own pending rows.
+Only changed cards, new reviews and deletions travel, as gzip-compressed
+JSON, so a sync after a day of reviews costs kilobytes whatever the deck
+size.
+
+Cards follow last-writer-wins on their modification time; reviews are an
+append-only log and are merged as a union by guid. Each accepted push gets
+the next server update sequence number (usn), which is what "since the
+last sync" is measured in.
+"""
+import gzip
+import json
+import logging
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import blobs
+from blobs import SQL_ANSWER_TEXT
+from store import PENDING_USN, SQL_RECOUNT_CARD_STATS, question_hash
+
+log = logging.getLogger("flashcards.sync")
+
+PROTOCOL_VERSION = 1
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+PAGE_SIZE = 2000
+TIMEOUT = 60
+
+# Wire rows are lists; the first two fields are the row's usn and guid
+CARD_FIELDS = ("usn", "guid", "question", "answer", "deck", "tags", "correct", "wrong", "due", "interval_days",
+               "ease", "reps", "lapses", "mtime")
+REVIEW_FIELDS = ("usn", "guid", "card", "reviewed_at", "grade", "response_ms")
+GRAVE_FIELDS = ("usn", "guid", "mtime")
+
+# Changed rows of each kind in (usn, row id) order; {0} is the condition.
+# Every query returns the row id first and then the wire fields.
+CARD_ANSWER = SQL_ANSWER_TEXT.format("f")
+SQL_CHANGES = {
+    "cards": f"""
+        SELECT f.id, f.usn, f.guid, f.question, {CARD_ANSWER}, d.name,
+               (SELECT json_group_array(t.name) FROM card_tags c JOIN tags t ON t.id = c.tag_id
+                WHERE c.card_id = f.id),
+               f.correct, f.wrong, f.due, f.interval_days, f.ease, f.reps, f.lapses, f.mtime
+        FROM flashcards f JOIN decks d ON d.id = f.deck_id
+        WHERE {{0}} ORDER BY f.usn, f.id LIMIT ?""",
+    "reviews": """
+        SELECT r.id, r.usn, r.guid, f.guid, r.reviewed_at, r.grade, r.response_ms
+        FROM reviews r LEFT JOIN flashcards f ON f.id = r.card_id
+        WHERE {0} ORDER BY r.usn, r.id LIMIT ?""",
+    "graves": """
+        SELECT g.rowid, g.usn, g.guid, g.mtime FROM sync_graves g
+        WHERE {0} ORDER BY g.usn, g.rowid LIMIT ?""",
+}
+CHANGE_TABLES = {"cards": "flashcards f", "reviews": "reviews r", "graves": "sync_graves g"}
+USN_COLUMNS = {"cards": "f.usn", "reviews": "r.usn", "graves": "g.usn"}
+ID_COLUMNS = {"cards": "f.id", "reviews": "r.id", "graves": "g.rowid"}
+# Marks pushed rows as synced unless they changed again in the meantime
+SQL_MARK_SYNCED = {
+    "cards": f"UPDATE flashcards SET usn = ? WHERE guid = ? AND usn = {PENDING_USN} AND mtime = ?",
+    "reviews": f"UPDATE reviews SET usn = ? WHERE guid = ? AND usn = {PENDING_USN}",
+    "graves": f"UPDATE sync_graves SET usn = ? WHERE guid = ? AND usn = {PENDING_USN} AND mtime = ?",
+}
+
+# The server's own edits wait at PENDING_USN until a client asks for changes
+SQL_STAMP_PENDING = (
+    f"UPDATE flashcards SET usn = ? WHERE usn = {PENDING_USN}",
+    f"UPDATE reviews SET usn = ? WHERE usn = {PENDING_USN}",
+    f"UPDATE sync_graves SET usn = ? WHERE usn = {PENDING_USN}",
+)
+SQL_MARK_ALL_PENDING = (
+    f"UPDATE flashcards SET usn = {PENDING_USN} WHERE usn != {PENDING_USN}",
+    f"UPDATE reviews SET usn = {PENDING_USN} WHERE usn != {PENDING_USN}",
+    f"UPDATE sync_graves SET usn = {PENDING_USN} WHERE usn != {PENDING_USN}",
+)
+
+SQL_LOCAL_CARD = "SELECT id, mtime, usn FROM flashcards WHERE guid = ?"
+# The same question in the same deck under another guid, e.g. a deck copied before it had guids
+SQL_SAME_CARD = "SELECT id, mtime, usn FROM flashcards WHERE question_hash = ? AND deck_id = ? LIMIT 1"
+SQL_ADOPT_GUID = "UPDATE flashcards SET guid = ? WHERE id = ?"
+SQL_APPLY_CARD = """
+    UPDATE flashcards SET question = ?, answer = ?, answer_blob = ?, question_hash = ?, answer_html = NULL,
+        deck_id = ?, correct = ?, wrong = ?, due = ?, interval_days = ?, ease = ?, reps = ?, lapses = ?, usn = ?,
+        mtime = ?
+    WHERE id = ?"""
+SQL_INSERT_SYNCED_CARD = """
+    INSERT INTO flashcards (question, answer, answer_blob, question_hash, deck_id, correct, wrong, due,
+                            interval_days, ease, reps, lapses, usn, mtime, guid)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+SQL_STAMP_CARD = "UPDATE flashcards SET usn = ?, mtime = ? WHERE id = ?"
+SQL_CARD_ID = "SELECT id FROM flashcards WHERE guid = ?"
+SQL_REVIEW_CARD = "SELECT card_id FROM reviews WHERE guid = ?"
+SQL_INSERT_SYNCED_REVIEW = (
+    "INSERT INTO reviews (card_id, reviewed_at, grade, response_ms, guid, usn) VALUES (?, ?, ?, ?, ?, ?)"
+)
+SQL_MOVE_SYNCED_REVIEW = "UPDATE reviews SET card_id = ?, usn = ? WHERE guid = ?"
+SQL_STAMP_REVIEW = "UPDATE reviews SET usn = ? WHERE guid = ?"
+SQL_DELETE_CARD = "DELETE FROM flashcards WHERE id = ?"
+SQL_SAVE_GRAVE = "INSERT OR REPLACE INTO sync_graves (guid, mtime, usn) VALUES (?, ?, ?)"
+
+
+class SyncError(Exception):
+    pass
+
+
+def changes(store, table, low, high, after=None, limit=PAGE_SIZE):
+    """One page of wire rows with a usn from ``low`` to ``high``.
+
+    Returns the rows and the (usn, id) cursor of the next page, or None
+    after the last page. A cursor is resumed with two index seeks, the rest
+    of its usn by id and then the following usns; SQLite does not seek on a
+    row-value comparison, and one push can put every card under one usn.
+    """
+    usn_column, id_column = USN_COLUMNS[table], ID_COLUMNS[table]
+    rows = []
+    if after is not None:
+        rows = store.execute(SQL_CHANGES[table].format(f"{usn_column} = ? AND {id_column} > ?"),
+                             (*after, limit)).fetchall()
+        low = after[0] + 1
+    if len(rows) < limit and low <= high:
+        rows += store.execute(SQL_CHANGES[table].format(f"{usn_column} BETWEEN ? AND ?"),
+                              (low, high, limit - len(rows))).fetchall()
+    wire = [list(row[1:]) for row in rows]
+    if table == "cards":
+        for row in wire:
+            row[3] = store.portable_text(row[3])
+            row[5] = json.loads(row[5])
+    return wire, ([rows[-1][1], rows[-1][0]] if len(rows) == limit else None)
+
+
+def count_changes(store, low, high):
+    return sum(store.execute(f"SELECT COUNT(*) FROM {CHANGE_TABLES[table]} WHERE {column} BETWEEN ? AND ?",
+                             (low, high)).fetchone()[0]
+               for table, column in USN_COLUMNS.items())
+
+
+def apply_cards(store, rows, usn=None, server=False):
+    """Write incoming cards, last writer wins.
+
+    A card with an unknown guid whose question is already in the deck is
+    that card: it takes the incoming guid and the same rules apply, so the
+    deck keeps one card per question. A local copy is kept when it is the
+    same version, or when it is newer and either still pending here or this
+    is the server. ``usn`` overrides the rows' own numbers (the server
+    stamps a push with a new one).
+    """
+    decks, applied = {}, 0
+    with store.transaction() as conn:
+        for row_usn, guid, question, answer, deck, tags, correct, wrong, due, interval_days, ease, reps, lapses, \
+                mtime in rows:
+            row_usn = row_usn if usn is None else usn
+            if deck not in decks:
+                decks[deck] = store.deck_id(deck, create=True)
+            digest = question_hash(question)
+            local = conn.execute(SQL_LOCAL_CARD, (guid,)).fetchone()
+            if local is None:
+                local = conn.execute(SQL_SAME_CARD, (digest, decks[deck])).fetchone()
+                if local is not None:
+                    conn.execute(SQL_ADOPT_GUID, (guid, local[0]))
+                    if server:
+                        # Other copies still know the card by its old guid
+                        conn.execute(SQL_STAMP_CARD, (row_usn, local[1], local[0]))
+            if local is not None:
+                card_id, local_mtime, local_usn = local
+                if local_mtime == mtime and local_usn == PENDING_USN and not server:
+                    # Already the same version (after a full merge), nothing to send back
+                    conn.execute(SQL_STAMP_CARD, (row_usn, mtime, card_id))
+                if local_mtime == mtime or (local_mtime > mtime and (server or local_usn == PENDING_USN)):
+                    continue
+            values = (question, *blobs.pack_answer(conn, answer), digest, decks[deck], correct, wrong, due,
+                      interval_days, ease, reps, lapses, row_usn, mtime)
+            if local is None:
+                card_id = conn.execute(SQL_INSERT_SYNCED_CARD, (*values, guid)).lastrowid
+            else:
+                conn.execute(SQL_APPLY_CARD, (*values, card_id))
+            if tags or local is not None:
+                # Replacing the tags marks the card as changed again, so restamp it
+                store.set_card_tags(card_id, tags)
+                conn.execute(SQL_STAMP_CARD, (row_usn, mtime, card_id))
+            applied += 1
+    return applied
+
+
+def apply_reviews(store, rows, usn=None, server=False):
+    # Union by guid. A known review only changes when a merge moved it to
+    # another card; reviews of cards this copy does not have are dropped.
+    applied = 0
+    with store.transaction() as conn:
+        for row_usn, guid, card, reviewed_at, grade, response_ms in rows:
+            card_id = conn.execute(SQL_CARD_ID, (card,)).fetchone() if card is not None else None
+            if card_id is None:
+                continue
+            card_id = card_id[0]
+            row_usn = row_usn if usn is None else usn
+            local = conn.execute(SQL_REVIEW_CARD, (guid,)).fetchone()
+            if local is None:
+                conn.execute(SQL_INSERT_SYNCED_REVIEW, (card_id, reviewed_at, grade, response_ms, guid, row_usn))
+            elif local[0] != card_id:
+                conn.execute(SQL_MOVE_SYNCED_REVIEW, (card_id, row_usn, guid))
+                conn.execute(SQL_RECOUNT_CARD_STATS, (card_id,))
+            else:
+                if not server:
+                    conn.execute(SQL_STAMP_REVIEW, (row_usn, guid))
+                continue
+            applied += 1
+    return applied
+
+
+def apply_graves(store, rows, usn=None, server=False):
+    # A card edited after it was deleted elsewhere survives, the same rule as apply_cards
+    applied = 0
+    with store.transaction() as conn:
+        for row_usn, guid, mtime in rows:
+            local = conn.execute(SQL_LOCAL_CARD, (guid,)).fetchone()
+            if local is not None:
+                card_id, local_mtime, local_usn = local
+                if local_mtime > mtime and (server or local_usn == PENDING_USN):
+                    continue
+                conn.execute(SQL_DELETE_CARD, (card_id,))
+                applied += 1
+            conn.execute(SQL_SAVE_GRAVE, (guid, mtime, row_usn if usn is None else usn))
+    return applied
+
+
+APPLY = {"cards": apply_cards, "reviews": apply_reviews, "graves": apply_graves}
+
+
+class SyncService:
+    """The server side of the protocol, independent of HTTP."""
+
+    def __init__(self, store):
+        self.store = store
+        # Identifies this server's numbering, so clients notice a different or restored server
+        self.id = store.meta("server_id")
+        if self.id is None:
+            self.id = uuid.uuid4().hex
+            store.set_meta("server_id", self.id)
+
+    def usn(self):
+        return int(self.store.meta("server_usn", 0))
+
+    def stamp_pending(self):
+        # Give the rows edited on the server itself the next usn, so clients pull them like a push
+        if not count_changes(self.store, PENDING_USN, PENDING_USN):
+            return
+        with self.store.transaction() as conn:
+            usn = self.usn() + 1
+            for statement in SQL_STAMP_PENDING:
+                conn.execute(statement, (usn,))
+            self.store.set_meta("server_usn", usn)
+
+    def meta(self, since=0):
+        self.stamp_pending()
+        return {"version": PROTOCOL_VERSION, "id": self.id, "usn": self.usn(),
+                "changes": count_changes(self.store, since + 1, self.usn())}
+
+    def pull(self, table, since, until, after=None, limit=PAGE_SIZE):
+        self.stamp_pending()
+        rows, after = changes(self.store, table, since + 1, until, after, min(limit, PAGE_SIZE))
+        return {"rows": rows, "after": after}
+
+    def push(self, table, rows):
+        # All rows of one push share a new usn, applied in one transaction
+        with self.store.transaction():
+            previous = self.usn()
+            usn = previous + 1
+            applied = APPLY[table](self.store, rows, usn, server=True)
+            self.store.set_meta("server_usn", usn)
+        return {"usn": usn, "previous": previous, "applied": applied}
+
+
+class SyncRequestHandler(BaseHTTPRequestHandler):
+    # POST /meta, /pull and /push with JSON bodies, optionally gzip-compressed both ways
+    def do_POST(self):
+        try:
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.headers.get("Content-Encoding") == "gzip":
+                body = gzip.decompress(body)
+            request = json.loads(body or b"{}")
+            service = self.server.service
+            if self.path == "/meta":
+                response = service.meta(request.get("since", 0))
+            elif self.path == "/pull":
+                response = service.pull(request["table"], request["since"], request["until"],
+                                        request.get("after"), request.get("limit", PAGE_SIZE))
+            elif self.path == "/push":
+                response = service.push(request["table"], request["rows"])
+            else:
+                self.send_json(404, {"error": f"unknown endpoint {self.path}"})
+                return
+        except (KeyError, ValueError) as e:
+            self.send_json(400, {"error": f"bad request: {e}"})
+        except Exception as e:
+            log.exception("sync request failed")
+            self.send_json(500, {"error": str(e)})
+        else:
+            self.send_json(200, response)
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+        if gzipped:
+            body = gzip.compress(body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.info("%s %s", self.address_string(), format % args)
+
+
+class SyncServer(HTTPServer):
+    """Serves one database; requests are handled one at a time."""
+
+    def __init__(self, store, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        super().__init__((host, port), SyncRequestHandler)
+        self.service = SyncService(store)
+
+
+class SyncClient:
+    def __init__(self, url, timeout=TIMEOUT):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.bytes_sent = self.bytes_received = 0
+
+    def call(self, endpoint, **payload):
+        body = gzip.compress(json.dumps(payload).encode("utf-8"))
+        request = urllib.request.Request(f"{self.url}/{endpoint}", data=body, headers={
+            "Content-Type": "application/json", "Content-Encoding": "gzip", "Accept-Encoding": "gzip"})
+        self.bytes_sent += len(body)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = response.read()
+                encoding = response.headers.get("Content-Encoding")
+        except urllib.error.HTTPError as e:
+            data = e.read()
+            if e.headers.get("Content-Encoding") == "gzip":
+                data = gzip.decompress(data)
+            try:
+                message = json.loads(data)["error"]
+            except (ValueError, KeyError):
+                message = e.reason
+            raise SyncError(f"sync server error ({e.code}): {message}") from e
+        except urllib.error.URLError as e:
+            raise SyncError(f"cannot reach sync server at {self.url}: {e.reason}") from e
+        self.bytes_received += len(data)
+        return json.loads(gzip.decompress(data) if encoding == "gzip" else data)
+
+
+class SyncResult:
+    def __init__(self):
+        self.pulled = dict.fromkeys(APPLY, 0)
+        self.pushed = dict.fromkeys(APPLY, 0)
+        self.bytes_sent = self.bytes_received = 0
+
+    def __str__(self):
+        return (f"received {self.pulled['cards']} cards, {self.pulled['reviews']} reviews, "
+                f"{self.pulled['graves']} deletions; sent {self.pushed['cards']} cards, "
+                f"{self.pushed['reviews']} reviews, {self.pushed['graves']} deletions "
+                f"({(self.bytes_sent + self.bytes_received) / 1024:.1f} KiB transferred)")
+
+
+def sync(store, url, progress=None, page_size=PAGE_SIZE):
+    """Bring ``store`` and the server at ``url`` up to date with each other.
+
+    Pulls first, so local edits only win conflicts they are newer for, then
+    pushes everything still pending. Pages are applied in their own
+    transactions, so an interrupted sync is simply repeated next time.
+    ``progress(done, total)`` counts rows. Returns a ``SyncResult``.
+    """
+    client = SyncClient(url)
+    result = SyncResult()
+    last = int(store.meta("last_usn", 0))
+    meta = client.call("meta", since=last)
+    if meta["version"] != PROTOCOL_VERSION:
+        raise SyncError(f"sync server speaks protocol {meta['version']}, this copy {PROTOCOL_VERSION}")
+    if meta["id"] != store.meta("sync_server_id") or meta["usn"] < last:
+        # A server we have not synced with (or one restored from a backup):
+        # merge everything both ways, which last-writer-wins makes safe
+        with store.transaction() as conn:
+            for statement in SQL_MARK_ALL_PENDING:
+                conn.execute(statement)
+            store.set_meta("sync_server_id", meta["id"])
+            store.set_meta("last_usn", 0)
+        last = 0
+        meta = client.call("meta", since=last)
+    until = meta["usn"]
+    total = meta["changes"] + count_changes(store, PENDING_USN, PENDING_USN)
+    done = 0
+
+    # Cards before reviews so that reviews find their cards, deletions last
+    for table, apply in APPLY.items():
+        after = None
+        while True:
+            page = client.call("pull", table=table, since=last, until=until, after=after, limit=page_size)
+            apply(store, page["rows"])
+            result.pulled[table] += len(page["rows"])
+            done += len(page["rows"])
+            if progress is not None:
+                progress(done, total)
+            after = page["after"]
+            if after is None:
+                break
+    last = until
+    store.set_meta("last_usn", last)
+
+    for table in APPLY:
+        after = None
+        while True:
+            rows, after = changes(store, table, PENDING_USN, PENDING_USN, after, page_size)
+            if not rows:
+                break
+            response = client.call("push", table=table, rows=rows)
+            with store.transaction() as conn:
+                if table == "reviews":
+                    conn.executemany(SQL_MARK_SYNCED[table], ((response["usn"], row[1]) for row in rows))
+                else:
+                    conn.executemany(SQL_MARK_SYNCED[table], ((response["usn"], row[1], row[-1]) for row in rows))
+                # Skipping our own push on the next pull is only safe if nobody pushed in between
+                if response["previous"] == last:
+                    last = response["usn"]
+                    store.set_meta("last_usn", last)
+            result.pushed[table] += len(rows)
+            done += len(rows)
+            if progress is not None:
+                progress(done, total)
+            if after is None:
+                break
+
+    store.set_meta("server_url", url)
+    result.bytes_sent, result.bytes_received = client.bytes_sent, client.bytes_received
+    return result
+
@@ -0,0 +1,101 @@
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from profiling import PROFILER
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class TaskSignals(QObject):
+    progress = Signal(int, int)
+    result = Signal(object)
+    error = Signal(object)
+    cancelled = Signal()
+    finished = Signal()
+
+
+class Task(QRunnable):
+    """Runs ``fn(*args, progress=..., **kwargs)`` on a pool thread.
+
+    ``fn`` reports through the ``progress(done, total)`` callback it is given;
+    once the task is cancelled that callback raises ``TaskCancelled``, so any
+    chunked job stops at its next chunk boundary. Outcomes are delivered
+    through ``signals``, which live on the GUI thread. ``cleanup`` runs on
+    the pool thread afterwards.
+    """
+
+    def __init__(self, fn, *args, cleanup=None, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.cleanup = cleanup
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def report_progress(self, done, total):
+        if self._cancelled.is_set():
+            raise TaskCancelled()
+        self.signals.progress.emit(done, total)
+
+    def run(self):
+        try:
+            with PROFILER.span(getattr(self.fn, "__name__", "task"), "task"):
+                result = self.fn(*self.args, progress=self.report_progress, **self.kwargs)
+        except TaskCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.error.emit(e)
+        else:
+            if self._cancelled.is_set():
+                self.signals.cancelled.emit()
+            else:
+                self.signals.result.emit(result)
+        finally:
+            if self.cleanup is not None:
+                self.cleanup()
+            self.signals.finished.emit()
+
+
+class TaskRunner(QObject):
+    active_changed = Signal(int)
+
+    # ``cleanup`` runs on the pool thread after every task, e.g.
+    # CardStore.release_connection: pool threads do not keep thread-local
+    # state between runs, so a connection left open there would never be reused.
+    def __init__(self, parent=None, max_threads=4, cleanup=None):
+        super().__init__(parent)
+        self.cleanup = cleanup
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.tasks = set()
+
+    def start(self, fn, *args, on_result=None, on_error=None, on_progress=None, on_cancelled=None, **kwargs):
+        task = Task(fn, *args, cleanup=self.cleanup, **kwargs)
+        # Keep our own reference so the signals object outlives the runnable
+        self.tasks.add(task)
+        for signal, slot in ((task.signals.result, on_result), (task.signals.error, on_error),
+                             (task.signals.progress, on_progress), (task.signals.cancelled, on_cancelled)):
+            if slot is not None:
+                signal.connect(slot)
+        task.signals.finished.connect(lambda: self._finished(task))
+        self.pool.start(task)
+        self.active_changed.emit(len(self.tasks))
+        return task
+
+    def _finished(self, task):
+        self.tasks.discard(task)
+        self.active_changed.emit(len(self.tasks))
+
+    def cancel_all(self):
+        for task in self.tasks:
+            task.cancel()
+
+    def wait(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
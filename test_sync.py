@@ -0,0 +1,128 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+import sync
+from store import CardStore
+
+
+def legacy_deck(path, cards):
+    # A deck in the original schema, before cards had guids
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE flashcards (id INTEGER PRIMARY KEY, question TEXT NOT NULL, "
+                 "answer TEXT NOT NULL, correct INTEGER DEFAULT 0, wrong INTEGER DEFAULT 0)")
+    conn.executemany("INSERT INTO flashcards (question, answer) VALUES (?, ?)", cards)
+    conn.commit()
+    conn.close()
+
+
+class SyncRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+        self.directory.cleanup()
+
+    def open(self, name):
+        store = CardStore(os.path.join(self.directory.name, name))
+        self.stores.append(store)
+        return store
+
+    def serve(self, store):
+        server = sync.SyncServer(store, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    def questions(self, store):
+        return sorted(row[0] for row in store.execute("SELECT question FROM flashcards"))
+
+    def test_round_trip(self):
+        server, client = self.open("server.db"), self.open("client.db")
+        url = self.serve(server)
+        client.add_card("client question", "client answer")
+        result = sync.sync(client, url)
+        self.assertEqual(result.pushed["cards"], 1)
+        self.assertEqual(self.questions(server), ["client question"])
+
+        other = self.open("other.db")
+        sync.sync(other, url)
+        self.assertEqual(self.questions(other), ["client question"])
+
+    def test_server_edits_reach_clients(self):
+        server, client = self.open("server.db"), self.open("client.db")
+        url = self.serve(server)
+        server.add_card("before first sync", "a")
+        sync.sync(client, url)
+        self.assertEqual(self.questions(client), ["before first sync"])
+
+        card_id = server.add_card("after first sync", "b")
+        result = sync.sync(client, url)
+        self.assertEqual(result.pulled["cards"], 1)
+        self.assertEqual(self.questions(client), ["after first sync", "before first sync"])
+
+        server.execute("DELETE FROM flashcards WHERE id = ?", (card_id,))
+        sync.sync(client, url)
+        self.assertEqual(self.questions(client), ["before first sync"])
+
+    def test_copied_deck_is_not_duplicated(self):
+        cards = [(f"question {i}", f"answer {i}") for i in range(5)]
+        legacy_deck(os.path.join(self.directory.name, "server.db"), cards)
+        legacy_deck(os.path.join(self.directory.name, "client.db"), cards)
+        server, client = self.open("server.db"), self.open("client.db")
+        url = self.serve(server)
+        sync.sync(client, url)
+        self.assertEqual(len(self.questions(server)), 5)
+        self.assertEqual(len(self.questions(client)), 5)
+        guids = "SELECT guid FROM flashcards ORDER BY question"
+        self.assertEqual(server.execute(guids).fetchall(), client.execute(guids).fetchall())
+
+        # Nothing is left to send back and forth
+        result = sync.sync(client, url)
+        self.assertEqual((result.pulled["cards"], result.pushed["cards"]), (0, 0))
+
+    def test_pushed_file_paths_are_not_read(self):
+        secret = os.path.join(self.directory.name, "secret.txt")
+        with open(secret, "w") as file:
+            file.write("not for clients")
+        server, client = self.open("server.db"), self.open("client.db")
+        url = self.serve(server)
+        client.add_card("question", f"![x]({secret})")
+        sync.sync(client, url)
+        self.assertEqual(server.execute("SELECT answer FROM flashcards").fetchone()[0], f"![x]({secret})")
+        self.assertEqual(server.execute("SELECT COUNT(*) FROM blobs").fetchone()[0], 0)
+
+    def test_pulled_file_paths_are_not_read_on_edit(self):
+        secret = os.path.join(self.directory.name, "secret.txt")
+        with open(secret, "w") as file:
+            file.write("not for clients")
+        server, client = self.open("server.db"), self.open("client.db")
+        url = self.serve(server)
+        server.add_card("question", f"![x]({secret})")
+        sync.sync(client, url)
+
+        # Saving the edit dialog unchanged, then with a path typed in
+        card_id, answer = client.execute("SELECT id, answer FROM flashcards").fetchone()
+        client.update_card(card_id, "question", answer, allow_files=True)
+        self.assertEqual(client.execute("SELECT answer FROM flashcards").fetchone()[0], f"![x]({secret})")
+        self.assertEqual(client.execute("SELECT COUNT(*) FROM blobs").fetchone()[0], 0)
+
+        picture = os.path.join(self.directory.name, "picture.png")
+        with open(picture, "wb") as file:
+            file.write(b"typed in")
+        client.update_card(card_id, "question", f"{answer} ![y]({picture})", allow_files=True)
+        answer = client.execute("SELECT answer FROM flashcards").fetchone()[0]
+        self.assertIn(f"![x]({secret})", answer)
+        self.assertNotIn(picture, answer)
+        self.assertEqual(client.execute("SELECT COUNT(*) FROM blobs").fetchone()[0], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()